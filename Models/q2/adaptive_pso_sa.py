@@ -6,7 +6,8 @@ class AdaptivePSOWithSA:
     """
     自适应粒子群优化算法结合模拟退火算法
     """
-    def __init__(self, fitness_function, param_bounds, num_particles=30, max_iterations=100, initial_solutions=None):
+    def __init__(self, fitness_function, param_bounds, num_particles=30, max_iterations=100, initial_solutions=None,
+                 batch_fitness_function=None):
         """
         初始化参数
         :param fitness_function: 适应度函数
@@ -14,8 +15,11 @@ class AdaptivePSOWithSA:
         :param num_particles: 粒子数量
         :param max_iterations: 最大迭代次数
         :param initial_solutions: 初始解列表，用于引导优化
+        :param batch_fitness_function: 批量适应度函数，输入 (n, d) 数组，返回 n 个适应度；
+                                       给出时整个粒子群一次评估（例如交给进程池），否则逐个调用 fitness_function
         """
         self.fitness_function = fitness_function
+        self.batch_fitness_function = batch_fitness_function
         self.param_bounds = param_bounds
         self.num_particles = num_particles
         self.max_iterations = max_iterations
@@ -46,6 +50,12 @@ class AdaptivePSOWithSA:
         
         self._initialize_particles()
     
+    def _evaluate_positions(self, positions):
+        """评估一组位置的适应度，有批量适应度函数时整批评估"""
+        if self.batch_fitness_function is not None:
+            return np.asarray(self.batch_fitness_function(np.asarray(positions)), dtype=float)
+        return np.array([self.fitness_function(position) for position in positions], dtype=float)
+
     def _initialize_particles(self):
         """初始化粒子群"""
         # 首先放置初始解
@@ -57,14 +67,6 @@ class AdaptivePSOWithSA:
                 min_val, max_val = self.param_bounds[j]
                 self.positions[i][j] = np.clip(initial_solution[j], min_val, max_val)
             self.velocities[i][j] = random.uniform(-abs(max_val-min_val)/2, abs(max_val-min_val)/2)
-            
-            self.pbest_positions[i] = self.positions[i].copy()
-            fitness = self.fitness_function(self.positions[i])
-            self.pbest_fitness[i] = fitness
-            
-            if fitness > self.gbest_fitness:
-                self.gbest_fitness = fitness
-                self.gbest_position = self.positions[i].copy()
         
         # 初始化剩余的粒子
         start_index = len(self.initial_solutions)
@@ -73,13 +75,15 @@ class AdaptivePSOWithSA:
                 min_val, max_val = self.param_bounds[j]
                 self.positions[i][j] = random.uniform(min_val, max_val)
                 self.velocities[i][j] = random.uniform(-abs(max_val-min_val)/2, abs(max_val-min_val)/2)
-            
+
+        # 整个粒子群一次评估
+        fitness_values = self._evaluate_positions(self.positions)
+        for i in range(self.num_particles):
             self.pbest_positions[i] = self.positions[i].copy()
-            fitness = self.fitness_function(self.positions[i])
-            self.pbest_fitness[i] = fitness
+            self.pbest_fitness[i] = fitness_values[i]
             
-            if fitness > self.gbest_fitness:
-                self.gbest_fitness = fitness
+            if fitness_values[i] > self.gbest_fitness:
+                self.gbest_fitness = fitness_values[i]
                 self.gbest_position = self.positions[i].copy()
     
     def _update_velocity_and_position(self):
@@ -112,9 +116,8 @@ class AdaptivePSOWithSA:
         self.c1 = 2.5 - (1.5 * iteration / self.max_iterations)
         self.c2 = 0.5 + (1.5 * iteration / self.max_iterations)
     
-    def _simulated_annealing(self, current_position, current_fitness, temperature):
-        """模拟退火机制"""
-        # 生成邻域解
+    def _generate_neighbor(self, current_position):
+        """生成模拟退火的邻域解"""
         new_position = current_position.copy()
         for j in range(self.dimensions):
             min_val, max_val = self.param_bounds[j]
@@ -122,11 +125,20 @@ class AdaptivePSOWithSA:
             perturbation = random.uniform(-0.1 * abs(max_val - min_val), 0.1 * abs(max_val - min_val))
             new_position[j] += perturbation
             new_position[j] = np.clip(new_position[j], min_val, max_val)
-        
+        return new_position
+
+    def _metropolis_accept(self, current_fitness, new_fitness, temperature):
+        """Metropolis准则"""
+        return new_fitness > current_fitness or random.random() < math.exp((new_fitness - current_fitness) / temperature)
+
+    def _simulated_annealing(self, current_position, current_fitness, temperature):
+        """模拟退火机制"""
+        # 生成邻域解
+        new_position = self._generate_neighbor(current_position)
         new_fitness = self.fitness_function(new_position)
         
         # Metropolis准则
-        if new_fitness > current_fitness or random.random() < math.exp((new_fitness - current_fitness) / temperature):
+        if self._metropolis_accept(current_fitness, new_fitness, temperature):
             return new_position, new_fitness
         else:
             return current_position, current_fitness
@@ -151,9 +163,10 @@ class AdaptivePSOWithSA:
             # 更新粒子
             self._update_velocity_and_position()
 
-            # 评估适应度
+            # 评估适应度：整个粒子群一次评估
+            fitness_values = self._evaluate_positions(self.positions)
             for i in range(self.num_particles):
-                fitness = self.fitness_function(self.positions[i])
+                fitness = fitness_values[i]
 
                 # 更新个体最优
                 if fitness > self.pbest_fitness[i]:
@@ -166,10 +179,13 @@ class AdaptivePSOWithSA:
                     self.gbest_position = self.positions[i].copy()
                     self._update_best_solutions(self.gbest_position, self.gbest_fitness)
 
-                # 模拟退火机制
-                if temperature > self.min_temperature:
-                    self.positions[i], self.pbest_fitness[i] = self._simulated_annealing(
-                        self.positions[i], self.pbest_fitness[i], temperature)
+            # 模拟退火机制：每个粒子的邻域解只依赖它自己的状态，所有邻域解同样一次评估
+            if temperature > self.min_temperature:
+                neighbors = np.array([self._generate_neighbor(self.positions[i]) for i in range(self.num_particles)])
+                neighbor_fitness = self._evaluate_positions(neighbors)
+                for i in range(self.num_particles):
+                    if self._metropolis_accept(self.pbest_fitness[i], neighbor_fitness[i], temperature):
+                        self.positions[i], self.pbest_fitness[i] = neighbors[i], neighbor_fitness[i]
 
                     # 更新全局最优（SA可能找到更好的解）
                     if self.pbest_fitness[i] > self.gbest_fitness:
@@ -3,52 +3,140 @@ import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from utils.motion import calculate_drop_and_explosion_position, calculate_missile_position
+from utils.motion import calculate_drop_and_explosion_position
 from utils.judge_cross_by_point_pick import *
+from utils.coverage_kernels import (STAGE_INACTIVE, STAGE_DISTANCE, STAGE_CONE,
+                                    check_engine, coverage_mask, generate_surface_sample_bank)
+from utils.missile_tables import MissileTable, resolve_missile_table
 import numpy as np
 import math
 import random
+import csv
+import warnings
 
-def calculate_effective_coverage_time(drone_initial_position, missile_initial_position, 
-                                      flight_speed, drop_time, explosion_delay, 
-                                      flight_direction, radius=10, time_range=None):
+# 每个时刻由哪一步给出遮蔽结论，取值见 utils.coverage_kernels
+STAGE_NAMES = {STAGE_INACTIVE: 'inactive', STAGE_DISTANCE: 'distance', STAGE_CONE: 'cone'}
+
+TIME_SERIES_COLUMNS = ['t', 'occluded', 'stage',
+                       'missile_x', 'missile_y', 'missile_z',
+                       'smoke_x', 'smoke_y', 'smoke_z', 'confidence']
+
+
+def resolve_time_range(time_range=None):
+    """返回时间序列及每个时刻代表的时长，time_range 为 None 时使用默认的 50 秒、50000 个时刻"""
+    if time_range is None:
+        initial_time, final_time=0,50
+        total_count=50000
+        time_range = np.linspace(initial_time, final_time, total_count)  # 默认为50秒的时间范围
+    else:
+        initial_time, final_time=time_range[0],time_range[-1]
+        total_count=len(time_range)
+    interval= (final_time-initial_time)/total_count
+    return time_range, interval
+
+
+def share_coverage_kwargs(broadcast, missile_initial_position=None, **coverage_kwargs):
     """
-    计算有效遮蔽时间。
+    将场景中只读的大数组发布到共享内存，供进程池中的工作进程零拷贝读取。
 
     参数：
-    drone_initial_position: 无人机的初始位置 (np.array)
-    missile_initial_position: 导弹的初始位置 (np.array)
-    flight_speed: 无人机的飞行速度 (m/s)
-    drop_time: 投放烟幕干扰弹的延时 (s)
-    explosion_delay: 起爆延迟 (s)
-    flight_direction: 无人机飞行方向的向量 (np.array)
-    radius: 烟幕有效遮蔽的半径 (m)
-    time_range: 时间范围 (np.array), 用于计算每个时刻的遮蔽效果，默认为None
+    broadcast: utils.shared_arrays.SharedArrayBroadcast
+    missile_initial_position: 导弹的初始位置 (np.array)，给出时同时发布导弹预计算表
+    coverage_kwargs: calculate_effective_coverage_time 的场景参数
 
     返回：
-    effective_coverage_time: 有效遮蔽的时间总和 (秒)
+    coverage_kwargs: time_range（以及非 reference 引擎的 sample_bank）替换为共享内存视图后的参数，
+                     可直接传给 calculate_effective_coverage_time；
+                     sample_bank 为 None 时生成一组固定的 num 个采样点，所有评估共用；
+                     给出 missile_initial_position 时增加 missile_table，其导弹位置表位于共享内存中
     """
-    initial_time, final_time=0,50
-    total_count=50000
-    interval= (final_time-initial_time)/total_count
-    if time_range is None:
-        time_range = np.linspace(initial_time, final_time, total_count)  # 默认为50秒的时间范围
+    coverage_kwargs = dict(coverage_kwargs)
+    time_range, _ = resolve_time_range(coverage_kwargs.get('time_range'))
+    coverage_kwargs['time_range'] = broadcast.publish(time_range)
+    if coverage_kwargs.get('engine', 'reference') != 'reference':
+        sample_bank = coverage_kwargs.get('sample_bank')
+        if sample_bank is None:
+            sample_bank = generate_surface_sample_bank(coverage_kwargs.get('num', 200))
+        coverage_kwargs['sample_bank'] = broadcast.publish(sample_bank)
+    if missile_initial_position is not None:
+        missile_table = MissileTable(missile_initial_position, coverage_kwargs.get('missile_speed', 300),
+                                     coverage_kwargs['time_range'])
+        missile_table.positions = broadcast.publish(missile_table.positions)
+        coverage_kwargs['missile_table'] = missile_table
+    return coverage_kwargs
 
-    effective_coverage_count = 0  # 初始化有效遮蔽时间
-    for t in time_range:
+
+def iterate_coverage_time_series(drone_initial_position, missile_initial_position,
+                                 flight_speed, drop_time, explosion_delay,
+                                 flight_direction, radius=10, time_range=None,
+                                 smoke_lifetime=20, sink_speed=3, missile_speed=300, num=200,
+                                 adaptive=False, tolerance=0.02, confidence=0.95,
+                                 include_inactive=True, engine='reference', sample_bank=None, missile_table=None):
+    """
+    逐个时刻生成遮蔽判断结果，参数与 calculate_effective_coverage_time 相同。
+    engine 不为 'reference' 时，occluded 与 stage 由 coverage_mask 对整个时间序列一次给出。
+
+    include_inactive: 为 True 时也生成烟幕未起爆或已消散的时刻（烟幕位置为 nan）
+
+    生成：
+    record: 字典，包含
+        t: 时刻 (s)
+        occluded: 是否有效遮蔽
+        stage: 给出结论的步骤 (STAGE_INACTIVE / STAGE_DISTANCE / STAGE_CONE)
+        missile_position: 导弹位置 (np.array)
+        smoke_position: 烟幕球心位置 (np.array)
+        confidence: 结论的置信度，仅自适应采样时给出，距离判断为 1，其余为 nan
+    """
+    time_range, _ = resolve_time_range(time_range)
+    # 导弹位置只与导弹初始位置、速度和时间序列有关，整个场景共用一张表
+    missile_table = resolve_missile_table(missile_table, missile_initial_position, missile_speed, time_range)
+    missile_positions = missile_table.positions
+
+    check_engine(engine, adaptive)
+    kernel_occluded = kernel_stage = None
+    if engine != 'reference':
+        if sample_bank is None:
+            sample_bank = generate_surface_sample_bank(num)
+        kernel_occluded, kernel_stage = coverage_mask(
+            time_range, drone_initial_position, missile_initial_position,
+            flight_speed, drop_time, explosion_delay, flight_direction, sample_bank,
+            radius=radius, smoke_lifetime=smoke_lifetime, sink_speed=sink_speed,
+            missile_speed=missile_speed, backend=engine, missile_table=missile_table)
+
+    for i, t in enumerate(time_range):
         time_since_explosion = t - (drop_time + explosion_delay)  # 从引爆开始的时间
-        if time_since_explosion < 0:
-            continue
-        # 错误检查：烟幕干扰弹已消失
-        elif time_since_explosion > 20:
+        # 烟幕未起爆或已消散
+        if time_since_explosion < 0 or time_since_explosion > smoke_lifetime:
+            if include_inactive:
+                yield {
+                    't': t,
+                    'occluded': False,
+                    'stage': STAGE_INACTIVE,
+                    'missile_position': missile_positions[i],
+                    'smoke_position': np.full(3, np.nan),
+                    'confidence': np.nan,
+                }
             continue
 
         # 计算烟幕干扰弹的投放位置、爆炸位置、烟雾位置
         drop_position, explosion_position, smoke_position = calculate_drop_and_explosion_position(
-            drone_initial_position, flight_direction, flight_speed, drop_time, explosion_delay, t)
+            drone_initial_position, flight_direction, flight_speed, drop_time, explosion_delay, t,
+            smoke_lifetime=smoke_lifetime, sink_speed=sink_speed)
         
-        # 计算导弹当前位置
-        missile_position = calculate_missile_position(missile_initial_position, t)
+        # 导弹当前位置
+        missile_position = missile_positions[i]
+
+        if kernel_occluded is not None:
+            yield {
+                't': t,
+                'occluded': bool(kernel_occluded[i]),
+                'stage': int(kernel_stage[i]),
+                'missile_position': missile_position,
+                'smoke_position': smoke_position,
+                'confidence': 1.0 if kernel_stage[i] == STAGE_DISTANCE else np.nan,
+            }
+            continue
+
         x1, y1, z1 = smoke_position
         x2, y2, z2 = missile_position
         
@@ -57,21 +145,169 @@ def calculate_effective_coverage_time(drone_initial_position, missile_initial_po
         
         # 如果距离小于半径，说明有效遮蔽
         if distance < radius:
-            effective_coverage_count += 1  # 每秒都计入有效遮蔽时间
+            yield {
+                't': t,
+                'occluded': True,
+                'stage': STAGE_DISTANCE,
+                'missile_position': missile_position,
+                'smoke_position': smoke_position,
+                'confidence': 1.0,
+            }
             continue
         
         # 调用 final_cross_judge 判断是否有交点
-        is_intersecting = complete_judge(missile_position, smoke_position,num=200)
-        
+        if adaptive:
+            is_intersecting, judge_confidence = complete_judge(missile_position, smoke_position, num=num, radius=radius,
+                                                               adaptive=True, tolerance=tolerance, confidence=confidence)
+        else:
+            is_intersecting = complete_judge(missile_position, smoke_position, num=num, radius=radius)
+            judge_confidence = np.nan
+
+        yield {
+            't': t,
+            'occluded': bool(is_intersecting),
+            'stage': STAGE_CONE,
+            'missile_position': missile_position,
+            'smoke_position': smoke_position,
+            'confidence': float(judge_confidence),
+        }
+
+
+def calculate_coverage_time_series(drone_initial_position, missile_initial_position,
+                                   flight_speed, drop_time, explosion_delay,
+                                   flight_direction, time_range=None, **kwargs):
+    """
+    计算完整的遮蔽时间序列，参数与 iterate_coverage_time_series 相同。
+
+    返回：
+    series: 字典，包含
+        t: 时刻 (N,)
+        occluded: 遮蔽掩码 (N,) bool
+        stage: 给出结论的步骤 (N,) int8
+        missile_position: 导弹位置 (N, 3)
+        smoke_position: 烟幕球心位置 (N, 3)
+        confidence: 置信度 (N,)
+        interval: 每个时刻代表的时长 (s)
+        effective_coverage_time: 有效遮蔽的时间总和 (s)，与 calculate_effective_coverage_time 一致
+    """
+    time_range, interval = resolve_time_range(time_range)
+    records = list(iterate_coverage_time_series(
+        drone_initial_position, missile_initial_position,
+        flight_speed, drop_time, explosion_delay, flight_direction,
+        time_range=time_range, **kwargs))
+
+    occluded = np.array([record['occluded'] for record in records], dtype=bool)
+    series = {
+        't': np.array([record['t'] for record in records], dtype=float),
+        'occluded': occluded,
+        'stage': np.array([record['stage'] for record in records], dtype=np.int8),
+        'missile_position': np.array([record['missile_position'] for record in records], dtype=float).reshape(-1, 3),
+        'smoke_position': np.array([record['smoke_position'] for record in records], dtype=float).reshape(-1, 3),
+        'confidence': np.array([record['confidence'] for record in records], dtype=float),
+        'interval': interval,
+        'effective_coverage_time': int(occluded.sum()) * interval,
+    }
+    return series
+
+
+def write_coverage_time_series(path, drone_initial_position, missile_initial_position,
+                               flight_speed, drop_time, explosion_delay,
+                               flight_direction, time_range=None, **kwargs):
+    """
+    将遮蔽时间序列逐行写入 CSV 文件，不在内存中保存完整序列，适合大规模扫描。
+    列名见 TIME_SERIES_COLUMNS，其余参数与 iterate_coverage_time_series 相同。
+
+    返回：
+    effective_coverage_time: 有效遮蔽的时间总和 (s)
+    """
+    time_range, interval = resolve_time_range(time_range)
+
+    effective_coverage_count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(TIME_SERIES_COLUMNS)
+        for record in iterate_coverage_time_series(
+                drone_initial_position, missile_initial_position,
+                flight_speed, drop_time, explosion_delay, flight_direction,
+                time_range=time_range, **kwargs):
+            if record['occluded']:
+                effective_coverage_count += 1
+            writer.writerow([record['t'], int(record['occluded']), record['stage'],
+                             *record['missile_position'], *record['smoke_position'],
+                             record['confidence']])
+    return effective_coverage_count * interval
+
+
+def calculate_effective_coverage_time(drone_initial_position, missile_initial_position, 
+                                      flight_speed, drop_time, explosion_delay, 
+                                      flight_direction, radius=10, time_range=None,
+                                      smoke_lifetime=20, sink_speed=3, missile_speed=300, num=200,
+                                      adaptive=False, tolerance=0.02, confidence=0.95,
+                                      engine='reference', sample_bank=None, missile_table=None):
+    """
+    计算有效遮蔽时间。
+
+    参数：
+    drone_initial_position: 无人机的初始位置 (np.array)
+    missile_initial_position: 导弹的初始位置 (np.array)
+    flight_speed: 无人机的飞行速度 (m/s)
+    drop_time: 投放烟幕干扰弹的延时 (s)
+    explosion_delay: 起爆延迟 (s)
+    flight_direction: 无人机飞行方向的向量 (np.array)
+    radius: 烟幕有效遮蔽的半径 (m)
+    time_range: 时间范围 (np.array), 用于计算每个时刻的遮蔽效果，默认为None；可为共享内存视图，见 share_coverage_kwargs
+    smoke_lifetime: 烟幕有效持续时间 (s)
+    sink_speed: 烟幕引爆后的下沉速度 (m/s)
+    missile_speed: 导弹飞行速度 (m/s)
+    num: 每个时刻在圆柱侧面上的采样点数（自适应模式下为采样上限）
+    adaptive: 是否使用分轮自适应采样判断遮蔽
+    tolerance: 自适应模式下允许的未遮蔽面积占比
+    confidence: 自适应模式下的目标置信度
+    engine: 'reference' 为逐时刻随机采样的原始实现；
+            'auto' / 'numba' / 'numpy' 使用 utils.coverage_kernels 中的整段计算内核，
+            所有时刻共用同一组采样点，'auto' 在未安装 numba 时退回 numpy
+    sample_bank: 内核使用的圆柱侧面采样点 (num, 3)，为 None 时随机生成 num 个；可为共享内存视图
+    missile_table: 导弹预计算表 (utils.missile_tables.MissileTable)，为 None 时按导弹初始位置和速度从缓存中获取；
+                   与导弹初始位置、速度或 time_range 不一致时抛出 ValueError
+
+    返回：
+    effective_coverage_time: 有效遮蔽的时间总和 (秒)
+    """
+    time_range, interval = resolve_time_range(time_range)
+
+    if adaptive and num < minimum_samples_to_cover(tolerance, confidence):
+        warnings.warn(f"num={num} 个采样点不足以在 tolerance={tolerance} 下以 {confidence} 的置信度判定遮蔽，"
+                      f"至少需要 {minimum_samples_to_cover(tolerance, confidence)} 个，遮蔽时刻将按点估计给出结论")
+
+    check_engine(engine, adaptive)
+    if engine != 'reference':
+        if sample_bank is None:
+            sample_bank = generate_surface_sample_bank(num)
+        occluded, _ = coverage_mask(
+            time_range, drone_initial_position, missile_initial_position,
+            flight_speed, drop_time, explosion_delay, flight_direction, sample_bank,
+            radius=radius, smoke_lifetime=smoke_lifetime, sink_speed=sink_speed,
+            missile_speed=missile_speed, backend=engine, missile_table=missile_table)
+        return int(occluded.sum()) * interval
+
+    effective_coverage_count = 0  # 初始化有效遮蔽时间
+    for record in iterate_coverage_time_series(
+            drone_initial_position, missile_initial_position,
+            flight_speed, drop_time, explosion_delay, flight_direction,
+            radius=radius, time_range=time_range,
+            smoke_lifetime=smoke_lifetime, sink_speed=sink_speed, missile_speed=missile_speed, num=num,
+            adaptive=adaptive, tolerance=tolerance, confidence=confidence,
+            include_inactive=False, missile_table=missile_table):
         # 如果有交点，说明有遮蔽
-        if is_intersecting:
+        if record['occluded']:
             effective_coverage_count += 1  # 每秒都计入有效遮蔽时间
 
     effective_coverage_time=effective_coverage_count*interval
     return effective_coverage_time
 
 
-def calculate_effective_coverage_time_for_optimization(params, drone_initial_position, missile_initial_position):
+def calculate_effective_coverage_time_for_optimization(params, drone_initial_position, missile_initial_position,
+                                                       **coverage_kwargs):
     """
     为优化算法计算有效遮蔽时间的包装函数。
 
@@ -79,6 +315,9 @@ def calculate_effective_coverage_time_for_optimization(params, drone_initial_pos
     params: 优化参数 [flight_speed, drop_time, explosion_delay, flight_direction_x, flight_direction_y]
     drone_initial_position: 无人机的初始位置 (np.array)
     missile_initial_position: 导弹的初始位置 (np.array)
+    coverage_kwargs: 透传给 calculate_effective_coverage_time 的场景参数
+                     (radius, time_range, smoke_lifetime, sink_speed, missile_speed, num,
+                      adaptive, tolerance, confidence, engine, sample_bank, missile_table)
 
     返回：
     effective_coverage_time: 有效遮蔽的时间总和 (秒)
@@ -98,7 +337,8 @@ def calculate_effective_coverage_time_for_optimization(params, drone_initial_pos
     
     effective_coverage_time = calculate_effective_coverage_time(
         drone_initial_position, missile_initial_position,
-        flight_speed, drop_time, explosion_delay, flight_direction
+        flight_speed, drop_time, explosion_delay, flight_direction,
+        **coverage_kwargs
     )
     
     # 只有当覆盖时间超过0.5才打印信息
@@ -0,0 +1,417 @@
+import sys
+import os
+import json
+import socket
+import asyncio
+import argparse
+import itertools
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from q2.calculate_effective_coverage_time import calculate_effective_coverage_time_for_optimization, resolve_time_range
+from utils.coverage_kernels import check_engine, generate_surface_sample_bank, select_backend
+
+DEFAULT_SOCKET_PATH = '/tmp/coverage_service.sock'
+
+# 客户端可以指定的场景参数，与 calculate_effective_coverage_time 的关键字参数一致
+# time_grid 为 {start, stop, count}，在工作进程中展开成时间序列，避免传输整个数组
+OPTION_KEYS = ('radius', 'smoke_lifetime', 'sink_speed', 'missile_speed', 'num',
+               'adaptive', 'tolerance', 'confidence', 'engine', 'time_grid')
+
+
+def _normalize_request(request):
+    """校验请求并转换为可哈希的任务元组 (params, drone, missile, options)"""
+    params = tuple(float(value) for value in request['params'])
+    if len(params) != 5:
+        raise ValueError("params 必须为 [flight_speed, drop_time, explosion_delay, dir_x, dir_y]")
+    drone_initial_position = tuple(float(value) for value in request['drone_initial_position'])
+    missile_initial_position = tuple(float(value) for value in request['missile_initial_position'])
+    options = request.get('options', {})
+    for key in options:
+        if key not in OPTION_KEYS:
+            raise ValueError(f"未知的选项: {key}")
+    options = json.dumps(options, sort_keys=True)
+    return params, drone_initial_position, missile_initial_position, options
+
+
+def _evaluate_batch(tasks):
+    """
+    在工作进程中计算一批任务的有效遮蔽时间。
+
+    同一批中场景参数相同的任务归为一组，每组只展开一次时间序列；
+    使用计算内核（engine 不为 'reference'）的组共用同一组采样点，整组经 coverage_mask 计算，
+    导弹预计算表由 utils.missile_tables 按导弹初始位置和速度缓存。
+
+    参数：
+    tasks: [(params, drone, missile, options_json), ...]
+
+    返回：
+    [(coverage_time, error), ...]，成功时 error 为 None
+    """
+    groups = OrderedDict()
+    for index, (params, drone_initial_position, missile_initial_position, options) in enumerate(tasks):
+        groups.setdefault((drone_initial_position, missile_initial_position, options), []).append((index, params))
+
+    results = [None] * len(tasks)
+    for (drone_initial_position, missile_initial_position, options), members in groups.items():
+        try:
+            coverage_kwargs = _group_coverage_kwargs(options)
+        except Exception as e:
+            for index, _ in members:
+                results[index] = (None, f"{type(e).__name__}: {e}")
+            continue
+        drone_initial_position = np.array(drone_initial_position)
+        missile_initial_position = np.array(missile_initial_position)
+        for index, params in members:
+            try:
+                coverage_time = calculate_effective_coverage_time_for_optimization(
+                    list(params), drone_initial_position, missile_initial_position, **coverage_kwargs)
+                results[index] = (float(coverage_time), None)
+            except Exception as e:
+                results[index] = (None, f"{type(e).__name__}: {e}")
+    return results
+
+
+def _group_coverage_kwargs(options):
+    """将一组任务共用的选项展开为 calculate_effective_coverage_time 的参数，时间序列和采样点库只生成一次"""
+    coverage_kwargs = json.loads(options)
+    time_grid = coverage_kwargs.pop('time_grid', None)
+    if time_grid is not None:
+        coverage_kwargs['time_range'] = np.linspace(time_grid['start'], time_grid['stop'], time_grid['count'])
+    coverage_kwargs['time_range'], _ = resolve_time_range(coverage_kwargs.get('time_range'))
+    engine = coverage_kwargs.get('engine', 'reference')
+    check_engine(engine, coverage_kwargs.get('adaptive', False))
+    if engine != 'reference':
+        select_backend(engine)
+        coverage_kwargs['sample_bank'] = generate_surface_sample_bank(coverage_kwargs.get('num', 200))
+    return coverage_kwargs
+
+
+def _socket_in_use(socket_path):
+    """尝试连接 Unix socket，判断是否已有服务在监听"""
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        return False
+    finally:
+        probe.close()
+    return True
+
+
+class CoverageService:
+    """
+    本地遮蔽时间计算服务。
+
+    - 多个客户端的请求按连接轮转取出，组成小批量后整体交给固定大小的进程池；
+    - 相同的在途请求只计算一次，结果共享；
+    - 计算结果存入 LRU 缓存，重复请求直接返回（蒙特卡洛结果因此在缓存有效期内保持一致）。
+    """
+    def __init__(self, workers=None, max_batch_size=16, batch_window=0.005, cache_size=10000):
+        """
+        :param workers: 工作进程数，默认为 CPU 核数
+        :param max_batch_size: 每个小批量的最大任务数
+        :param batch_window: 组批时等待更多请求的时间 (s)
+        :param cache_size: 结果缓存的最大条目数
+        """
+        self.workers = workers or os.cpu_count()
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        self.cache_size = cache_size
+
+        self.cache = OrderedDict()
+        self.inflight = {}
+        # 每个客户端一个待计算队列，组批时轮转取出，保证并发负载下的公平
+        self.client_queues = OrderedDict()
+        self.client_ids = itertools.count()
+        self.stats = {'requests': 0, 'cache_hits': 0, 'deduplicated': 0, 'evaluated': 0, 'batches': 0}
+
+        self.executor = None
+        self.pending_event = None
+        self.batch_slots = None
+
+    def _cache_get(self, key):
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        return None
+
+    def _cache_put(self, key, value):
+        self.cache[key] = value
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def submit(self, client_id, key):
+        """提交一个任务，返回 (future, source)，source 为 'cache' / 'inflight' / 'queued'"""
+        self.stats['requests'] += 1
+        loop = asyncio.get_running_loop()
+
+        cached = self._cache_get(key)
+        if cached is not None:
+            self.stats['cache_hits'] += 1
+            future = loop.create_future()
+            future.set_result(cached)
+            return future, 'cache'
+
+        if key in self.inflight:
+            self.stats['deduplicated'] += 1
+            return self.inflight[key], 'inflight'
+
+        future = loop.create_future()
+        self.inflight[key] = future
+        self.client_queues.setdefault(client_id, deque()).append(key)
+        self.pending_event.set()
+        return future, 'queued'
+
+    def _take_batch(self):
+        """按客户端轮转取出至多 max_batch_size 个任务"""
+        batch = []
+        while self.client_queues and len(batch) < self.max_batch_size:
+            client_id, queue = next(iter(self.client_queues.items()))
+            batch.append(queue.popleft())
+            # 取过的客户端移到末尾，队列空了就移除
+            del self.client_queues[client_id]
+            if queue:
+                self.client_queues[client_id] = queue
+        return batch
+
+    async def _run_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self.executor, _evaluate_batch, batch)
+        except Exception as e:
+            results = [(None, f"{type(e).__name__}: {e}")] * len(batch)
+        finally:
+            self.batch_slots.release()
+
+        self.stats['batches'] += 1
+        self.stats['evaluated'] += len(batch)
+        for key, (coverage_time, error) in zip(batch, results):
+            future = self.inflight.pop(key)
+            if error is None:
+                self._cache_put(key, coverage_time)
+                future.set_result(coverage_time)
+            else:
+                future.set_exception(RuntimeError(error))
+
+    async def _batcher(self):
+        """组批循环：有空闲工作进程时才取出下一批，未取出的请求留在各客户端队列中轮转"""
+        while True:
+            await self.pending_event.wait()
+            await self.batch_slots.acquire()
+            # 稍等片刻，让同一时间到达的请求进入同一批
+            await asyncio.sleep(self.batch_window)
+            batch = self._take_batch()
+            if not self.client_queues:
+                self.pending_event.clear()
+            if not batch:
+                self.batch_slots.release()
+                continue
+            asyncio.ensure_future(self._run_batch(batch))
+
+    async def _respond(self, writer, write_lock, request_id, future, source):
+        try:
+            coverage_time = await asyncio.shield(future)
+            response = {'id': request_id, 'coverage_time': coverage_time, 'source': source}
+        except Exception as e:
+            response = {'id': request_id, 'error': str(e)}
+        async with write_lock:
+            writer.write((json.dumps(response) + '\n').encode('utf-8'))
+            await writer.drain()
+
+    async def handle_client(self, reader, writer):
+        """处理一个客户端连接：每行一个 JSON 请求，响应同样按行返回，可能乱序，用 id 对应"""
+        client_id = next(self.client_ids)
+        write_lock = asyncio.Lock()
+        responders = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request_id = None
+                try:
+                    request = json.loads(line)
+                    request_id = request.get('id')
+                    if request.get('command') == 'stats':
+                        response = dict(self.stats, id=request_id, cache_size=len(self.cache))
+                        async with write_lock:
+                            writer.write((json.dumps(response) + '\n').encode('utf-8'))
+                        continue
+                    key = _normalize_request(request)
+                except Exception as e:
+                    async with write_lock:
+                        writer.write((json.dumps({'id': request_id, 'error': f"{type(e).__name__}: {e}"}) + '\n').encode('utf-8'))
+                    continue
+                future, source = self.submit(client_id, key)
+                task = asyncio.ensure_future(self._respond(writer, write_lock, request_id, future, source))
+                responders.add(task)
+                task.add_done_callback(responders.discard)
+            if responders:
+                await asyncio.gather(*responders, return_exceptions=True)
+        finally:
+            writer.close()
+
+    async def serve(self, socket_path=None, host='127.0.0.1', port=None):
+        """
+        启动服务，port 为 None 时监听 Unix socket，否则监听本机 TCP 端口。
+        socket 文件已存在时先尝试连接：有服务应答则报错退出，无应答才视为残留文件删除。
+        """
+        if port is None:
+            socket_path = socket_path or DEFAULT_SOCKET_PATH
+            if os.path.exists(socket_path):
+                if _socket_in_use(socket_path):
+                    raise RuntimeError(f"{socket_path} 上已有服务在运行")
+                # 上次异常退出留下的 socket 文件
+                os.remove(socket_path)
+
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.pending_event = asyncio.Event()
+        self.batch_slots = asyncio.Semaphore(self.workers)
+
+        if port is None:
+            server = await asyncio.start_unix_server(self.handle_client, path=socket_path)
+            print(f"遮蔽时间计算服务已启动: unix://{socket_path}, {self.workers} 个工作进程")
+        else:
+            server = await asyncio.start_server(self.handle_client, host=host, port=port)
+            print(f"遮蔽时间计算服务已启动: tcp://{host}:{port}, {self.workers} 个工作进程")
+
+        batcher = asyncio.ensure_future(self._batcher())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            self.executor.shutdown(cancel_futures=True)
+            if port is None and os.path.exists(socket_path):
+                os.remove(socket_path)
+
+
+class CoverageClient:
+    """
+    遮蔽时间计算服务的同步客户端，供脚本和 notebook 使用。
+
+    用法：
+        client = CoverageClient()
+        coverage_times = client.evaluate_many(params_list, drone_initial_position, missile_initial_position, num=200)
+    """
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, host='127.0.0.1', port=None, timeout=None):
+        if port is None:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(socket_path)
+        else:
+            self.sock = socket.create_connection((host, port))
+        self.sock.settimeout(timeout)
+        self.stream = self.sock.makefile('rwb')
+        self.request_ids = itertools.count()
+
+    def close(self):
+        self.stream.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def _encode(request):
+        return (json.dumps(request) + '\n').encode('utf-8')
+
+    def _send(self, request):
+        self.stream.write(self._encode(request))
+
+    def _receive(self):
+        line = self.stream.readline()
+        if not line:
+            raise ConnectionError("遮蔽时间计算服务已断开")
+        return json.loads(line)
+
+    def evaluate_many(self, params_list, drone_initial_position, missile_initial_position, **options):
+        """
+        批量计算有效遮蔽时间，请求一次性发出，服务端可以把它们放进同一批。
+
+        参数：
+        params_list: [[flight_speed, drop_time, explosion_delay, dir_x, dir_y], ...]
+        options: 场景参数，见 OPTION_KEYS
+
+        返回：
+        coverage_times: 与 params_list 顺序一致的有效遮蔽时间列表
+        """
+        # 先构造并校验全部请求行再写入，某一行出错时不会有部分请求留在写缓冲区里
+        drone_initial_position = [float(value) for value in drone_initial_position]
+        missile_initial_position = [float(value) for value in missile_initial_position]
+        requests = [
+            {
+                'params': [float(value) for value in params],
+                'drone_initial_position': drone_initial_position,
+                'missile_initial_position': missile_initial_position,
+                'options': options,
+            }
+            for params in params_list
+        ]
+        lines = []
+        id_to_index = {}
+        for index, request in enumerate(requests):
+            request_id = next(self.request_ids)
+            id_to_index[request_id] = index
+            lines.append(self._encode(dict(request, id=request_id)))
+        self.stream.write(b''.join(lines))
+        self.stream.flush()
+
+        # 先读完本批全部响应再报告错误，避免残留的响应被下一次调用读到
+        coverage_times = [None] * len(params_list)
+        errors = []
+        while id_to_index:
+            response = self._receive()
+            index = id_to_index.pop(response.get('id'), None)
+            if index is None:
+                # 之前中断的调用遗留的响应
+                continue
+            if 'error' in response:
+                errors.append(f"params_list[{index}]: {response['error']}")
+            else:
+                coverage_times[index] = response['coverage_time']
+        if errors:
+            raise RuntimeError("; ".join(errors))
+        return coverage_times
+
+    def evaluate(self, params, drone_initial_position, missile_initial_position, **options):
+        """计算单组参数的有效遮蔽时间"""
+        return self.evaluate_many([params], drone_initial_position, missile_initial_position, **options)[0]
+
+    def stats(self):
+        """返回服务端的请求、缓存命中、去重和批次统计"""
+        self._send({'id': next(self.request_ids), 'command': 'stats'})
+        self.stream.flush()
+        return self._receive()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地遮蔽时间计算服务")
+    parser.add_argument('--socket', default=DEFAULT_SOCKET_PATH, help=f"Unix socket 路径 (默认: {DEFAULT_SOCKET_PATH})")
+    parser.add_argument('--port', type=int, default=None, help="改为监听 127.0.0.1 的 TCP 端口")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="工作进程数 (默认: CPU 核数)")
+    parser.add_argument('--batch-size', type=int, default=16, help="每个小批量的最大任务数")
+    parser.add_argument('--batch-window', type=float, default=0.005, help="组批等待时间 (s)")
+    parser.add_argument('--cache-size', type=int, default=10000, help="结果缓存条目数")
+    args = parser.parse_args(argv)
+
+    service = CoverageService(workers=args.workers, max_batch_size=args.batch_size,
+                              batch_window=args.batch_window, cache_size=args.cache_size)
+    try:
+        asyncio.run(service.serve(socket_path=args.socket, port=args.port))
+    except KeyboardInterrupt:
+        pass
+    except RuntimeError as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,74 +1,180 @@
 import sys
 import os
+import argparse
+import random
+import functools
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from q2.calculate_effective_coverage_time import calculate_effective_coverage_time_for_optimization
-from q2.adaptive_pso_sa import AdaptivePSOWithSA
+from q2.calculate_effective_coverage_time import calculate_effective_coverage_time_for_optimization, share_coverage_kwargs
+from q2.smooth_coverage import polish_solution
+from q2.optimizers import OPTIMIZER_BACKENDS, create_optimizer, create_parallel_batch_fitness, benchmark_optimizers
+from utils.coverage_kernels import ENGINES
+from utils.shared_arrays import SharedArrayBroadcast
+
+# 定义优化参数的边界
+# [flight_speed, drop_time, explosion_delay, theta]
+PARAM_BOUNDS = [
+    (70, 140),    # flight_speed (m/s)
+    (0, 10),      # drop_time (seconds)
+    (0, 10),      # explosion_delay (seconds)
+    (175, 185)      # theta (degrees)
+]
+
+# 定义一些初始解来引导优化，包括q1中的参数作为验证
+# 初始解格式：[flight_speed, drop_time, explosion_delay, theta]
+INITIAL_SOLUTIONS = [
+    [120, 1.5, 3.6, 180],  # q1中的参数：飞行速度120m/s，投放时间1.5s，爆炸延迟3.6s，方向角180度（对应方向向量(-1,0)）
+    [115, 0.5, 2, 179],
+    [114, 0.3, 0, 181]
+]
+
+
+def coverage_fitness(drone_initial_position, missile_initial_position, coverage_kwargs, params):
+    """
+    以 [flight_speed, drop_time, explosion_delay, theta] 为输入的适应度函数，返回有效遮蔽时间。
+    定义在模块层面，以便通过 functools.partial 固定场景后传给进程池。
+    """
+    try:
+        # 从参数中提取theta并转换为方向向量
+        flight_speed, drop_time, explosion_delay, theta = params
+        # 将角度转换为弧度
+        theta_rad = np.radians(theta)
+        # 计算方向向量分量
+        dir_x = np.cos(theta_rad)
+        dir_y = np.sin(theta_rad)
+        
+        # 创建飞行方向向量（z方向速度为0）
+        flight_direction = np.array([dir_x, dir_y, 0])
+        
+        normalized_params = [flight_speed, drop_time, explosion_delay, dir_x, dir_y]
+        coverage_time = calculate_effective_coverage_time_for_optimization(
+            normalized_params, drone_initial_position, missile_initial_position,
+            **coverage_kwargs)
+        
+        # 只有当覆盖时间大于0.5时才打印参数和覆盖时间
+        if coverage_time > 0.5:
+            print(f"Parameters: Flight Speed={flight_speed:.2f}, Drop Time={drop_time:.2f}, Explosion Delay={explosion_delay:.2f}, Direction=({dir_x:.4f}, {dir_y:.4f}), Theta={theta:.2f}°, Coverage Time={coverage_time:.4f}")
+        
+        return coverage_time
+    except Exception as e:
+        # 如果计算过程中出现错误，返回一个很小的适应度值
+        print(f"Error in fitness function: {e}")
+        return 0.0
+
+
+def create_fitness_function(drone_initial_position, missile_initial_position, **coverage_kwargs):
+    """
+    构造以 [flight_speed, drop_time, explosion_delay, theta] 为输入的适应度函数。
+
+    参数：
+    drone_initial_position: 无人机的初始位置 (np.array)
+    missile_initial_position: 导弹的初始位置 (np.array)
+    coverage_kwargs: 透传给 calculate_effective_coverage_time 的场景参数
+
+    返回：
+    fitness_function: 返回有效遮蔽时间的适应度函数（可被 pickle）
+    """
+    return functools.partial(coverage_fitness, drone_initial_position, missile_initial_position, coverage_kwargs)
+
+
+def print_benchmark(reports):
+    """打印各后端的对比结果"""
+    print("\n" + "="*50)
+    print("优化器对比:")
+    print("="*50)
+    for report in reports:
+        line = (f"{report['backend']:>8}: 最佳适应度 {report['best_fitness']:.4f}, "
+                f"评估次数 {report['evaluations']}, 用时 {report['elapsed_seconds']:.1f} s")
+        if 'evaluations_to_target' in report:
+            line += f", 达到目标所需评估次数 {report['evaluations_to_target']}"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="第二问：优化烟幕干扰弹投放策略")
+    parser.add_argument('--backend', choices=list(OPTIMIZER_BACKENDS), default='pso_sa', help="优化器后端 (默认: pso_sa)")
+    parser.add_argument('--max-evaluations', type=int, default=None,
+                        help="适应度评估次数上限 (默认: pso_sa 不限制，其余后端 3000)")
+    parser.add_argument('--target', type=float, default=None, help="目标有效遮蔽时间，达到后停止并统计所需评估次数")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="并行评估的进程数，默认串行")
+    parser.add_argument('--benchmark', action='store_true', help="在相同评估预算下依次运行全部后端并对比")
+    parser.add_argument('--seed', type=int, default=None, help="随机种子")
+    parser.add_argument('--no-polish', action='store_true', help="跳过优化结束后基于连续遮蔽时间的局部精修")
+    parser.add_argument('--engine', choices=list(ENGINES), default='reference',
+                        help="遮蔽判断的计算引擎 (默认: reference)")
+    args = parser.parse_args(argv)
 
-def main():
     # 设置初始位置
     drone_initial_position = np.array([17800, 0, 1800])
     missile_initial_position = np.array([20000, 0, 2000])
-    
-    # 定义优化参数的边界
-    # [flight_speed, drop_time, explosion_delay, theta]
-    param_bounds = [
-        (70, 140),    # flight_speed (m/s)
-        (0, 10),      # drop_time (seconds)
-        (0, 10),      # explosion_delay (seconds)
-        (175, 185)      # theta (degrees)
-    ]
-    
+
+    # 在生成共享采样点库之前设置随机种子，使 --seed 对非 reference 引擎的采样点库同样生效
+    if args.seed is not None:
+        np.random.seed(args.seed)
+        random.seed(args.seed)
+
+    coverage_kwargs = {'engine': args.engine}
+
+    # 并行评估时，时间序列、采样点库和导弹位置表只发布一次到共享内存，各工作进程直接映射，不再随每个任务序列化
+    broadcast = None
+    executor = None
+    if args.workers:
+        broadcast = SharedArrayBroadcast()
+        coverage_kwargs = share_coverage_kwargs(broadcast, missile_initial_position, **coverage_kwargs)
+        executor = ProcessPoolExecutor(max_workers=args.workers)
+
     # 定义适应度函数
-    def fitness_function(params):
-        try:
-            # 从参数中提取theta并转换为方向向量
-            flight_speed, drop_time, explosion_delay, theta = params
-            # 将角度转换为弧度
-            theta_rad = np.radians(theta)
-            # 计算方向向量分量
-            dir_x = np.cos(theta_rad)
-            dir_y = np.sin(theta_rad)
-            
-            # 创建飞行方向向量（z方向速度为0）
-            flight_direction = np.array([dir_x, dir_y, 0])
-            
-            normalized_params = [flight_speed, drop_time, explosion_delay, dir_x, dir_y]
-            coverage_time = calculate_effective_coverage_time_for_optimization(
-                normalized_params, drone_initial_position, missile_initial_position)
-            
-            # 只有当覆盖时间大于0.5时才打印参数和覆盖时间
-            if coverage_time > 0.5:
-                print(f"Parameters: Flight Speed={flight_speed:.2f}, Drop Time={drop_time:.2f}, Explosion Delay={explosion_delay:.2f}, Direction=({dir_x:.4f}, {dir_y:.4f}), Theta={theta:.2f}°, Coverage Time={coverage_time:.4f}")
-            
-            return coverage_time
-        except Exception as e:
-            # 如果计算过程中出现错误，返回一个很小的适应度值
-            print(f"Error in fitness function: {e}")
-            return 0.0
-    
-    # 创建自适应PSO+SA优化器
-    # 定义一些初始解来引导优化，包括q1中的参数作为验证
-    # 初始解格式：[flight_speed, drop_time, explosion_delay, theta]
-    initial_solutions = [
-        [120, 1.5, 3.6, 180],  # q1中的参数：飞行速度120m/s，投放时间1.5s，爆炸延迟3.6s，方向角180度（对应方向向量(-1,0)）
-        [115, 0.5, 2, 179],
-        [114, 0.3, 0, 181]
-    ]
-    
-    pso_sa = AdaptivePSOWithSA(
-        fitness_function=fitness_function,
-        param_bounds=param_bounds,
-        num_particles=30,
-        max_iterations=100,
-        initial_solutions=initial_solutions
-    )
-    
-    # 执行优化
-    print("开始优化过程...")
-    best_position, best_fitness, best_solutions = pso_sa.optimize()
+    fitness_function = create_fitness_function(drone_initial_position, missile_initial_position, **coverage_kwargs)
+    batch_fitness_function = create_parallel_batch_fitness(fitness_function, executor) if executor else None
+
+    try:
+        if args.benchmark:
+            reports = benchmark_optimizers(
+                fitness_function, PARAM_BOUNDS,
+                max_evaluations=args.max_evaluations or 3000,
+                target_fitness=args.target,
+                seed=args.seed,
+                initial_solutions=INITIAL_SOLUTIONS,
+                batch_fitness_function=batch_fitness_function)
+            print_benchmark(reports)
+            return
+
+        # 创建优化器，默认为自适应PSO+SA
+        options = {
+            'initial_solutions': INITIAL_SOLUTIONS,
+            'batch_fitness_function': batch_fitness_function,
+            'target_fitness': args.target,
+        }
+        if args.max_evaluations is not None:
+            options['max_evaluations'] = args.max_evaluations
+        if args.backend == 'pso_sa':
+            options.update(num_particles=30, max_iterations=100)
+        optimizer = create_optimizer(args.backend, fitness_function, PARAM_BOUNDS, **options)
+
+        # 执行优化
+        print("开始优化过程...")
+        best_position, best_fitness, best_solutions = optimizer.optimize()
+        print_benchmark([optimizer.report()])
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if broadcast is not None:
+            broadcast.close()
+
+    # 以 gbest_position 为起点，在连续遮蔽时间上做局部精修；
+    # 精修结果单独打印，best_fitness 仍为蒙特卡洛遮蔽时间，与下面的前10个最佳解可比
+    polished_position = polished_fitness = None
+    if not args.no_polish:
+        print("开始局部精修...")
+        polished_position, polished_fitness, polish_info = polish_solution(
+            best_position, PARAM_BOUNDS, drone_initial_position, missile_initial_position)
+        print(f"精修: 连续遮蔽时间 {polish_info['initial_coverage']:.6f} -> {polished_fitness:.6f} s, "
+              f"评估次数 {polish_info['evaluations']}")
+        if not polish_info['success']:
+            print(f"警告: 精修未收敛 ({polish_info['message']})，保留不劣于起点的结果")
     
     # 打印最佳解
     print("\n" + "="*50)
@@ -86,6 +192,13 @@ def main():
     dir_y = np.sin(theta_rad)
     print(f"  飞行方向X: {dir_x:.4f}")
     print(f"  飞行方向Y: {dir_y:.4f}")
+
+    if polished_position is not None:
+        print("\n" + "="*50)
+        print("精修结果:")
+        print("="*50)
+        print(f"连续遮蔽时间: {polished_fitness:.6f} 秒（由遮蔽区间端点计算，与蒙特卡洛遮蔽时间不直接可比）")
+        print(f"精修后参数: [{', '.join(f'{value:.8f}' for value in polished_position)}]")
     
     # 打印前10个最佳解
     print("\n" + "="*50)
@@ -0,0 +1,350 @@
+import sys
+import os
+import time
+import math
+import random
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from q2.adaptive_pso_sa import AdaptivePSOWithSA
+
+
+class _BudgetExhausted(Exception):
+    """评估次数用完或已达到目标适应度时，用于中断优化过程"""
+
+
+class OptimizerBase:
+    """
+    优化器公共接口（求最大值）。
+
+    各后端共享：
+    - 边界处理：所有待评估的位置都先裁剪到 param_bounds 内；
+    - 批量评估：evaluate 一次评估一组位置，给出 batch_fitness_function 时整批交给它（例如进程池），
+      否则逐个调用 fitness_function；
+    - 运行记录：评估次数、最优解、前10个最佳解、最优值随评估次数的变化 history。
+    """
+    name = 'base'
+
+    def __init__(self, fitness_function, param_bounds, max_evaluations=None, initial_solutions=None,
+                 batch_fitness_function=None, target_fitness=None, verbose=True):
+        """
+        :param fitness_function: 适应度函数
+        :param param_bounds: 参数边界 [(min1, max1), (min2, max2), ...]
+        :param max_evaluations: 最大适应度评估次数，None 表示不限制
+        :param initial_solutions: 初始解列表，用于引导优化
+        :param batch_fitness_function: 批量适应度函数，输入 (n, d) 数组，返回 n 个适应度
+        :param target_fitness: 达到该适应度后提前停止
+        :param verbose: 是否打印每一代的进度
+        """
+        self.fitness_function = fitness_function
+        self.param_bounds = param_bounds
+        self.dimensions = len(param_bounds)
+        self.lower = np.array([bound[0] for bound in param_bounds], dtype=float)
+        self.upper = np.array([bound[1] for bound in param_bounds], dtype=float)
+        self.max_evaluations = max_evaluations
+        self.initial_solutions = [self.clip(np.asarray(solution, dtype=float))
+                                  for solution in (initial_solutions or [])]
+        self.batch_fitness_function = batch_fitness_function
+        self.target_fitness = target_fitness
+        self.verbose = verbose
+
+        self.evaluations = 0
+        self.gbest_position = None
+        self.gbest_fitness = -np.inf
+        self.best_solutions = []
+        self.history = []  # [(评估次数, 当前最优适应度), ...]，仅在最优值提升时记录
+        self.elapsed_time = 0.0
+
+    def clip(self, positions):
+        """将位置裁剪到参数边界内"""
+        return np.clip(positions, self.lower, self.upper)
+
+    def random_positions(self, count):
+        """在参数边界内均匀随机生成 count 个位置"""
+        return self.lower + np.random.random((count, self.dimensions)) * (self.upper - self.lower)
+
+    def should_stop(self):
+        if self.max_evaluations is not None and self.evaluations >= self.max_evaluations:
+            return True
+        if self.target_fitness is not None and self.gbest_fitness >= self.target_fitness:
+            return True
+        return False
+
+    def _update_best_solutions(self, position, fitness):
+        """更新最佳解记录，格式与 AdaptivePSOWithSA 一致"""
+        self.best_solutions.append({'fitness': fitness, 'params': position.copy()})
+        self.best_solutions.sort(key=lambda x: x['fitness'], reverse=True)
+        self.best_solutions = self.best_solutions[:10]
+
+    def evaluate(self, positions):
+        """
+        评估一组位置的适应度。
+
+        超出评估预算的位置不再计算，适应度记为 -inf；预算在调用前就已用完时抛出 _BudgetExhausted。
+
+        返回：
+        fitness: (n,) 适应度数组
+        """
+        positions = self.clip(np.atleast_2d(np.asarray(positions, dtype=float)))
+        if self.should_stop():
+            raise _BudgetExhausted()
+
+        count = len(positions)
+        if self.max_evaluations is not None:
+            count = min(count, self.max_evaluations - self.evaluations)
+
+        fitness = np.full(len(positions), -np.inf)
+        if self.batch_fitness_function is not None:
+            fitness[:count] = np.asarray(self.batch_fitness_function(positions[:count]), dtype=float)
+        else:
+            fitness[:count] = [self.fitness_function(position) for position in positions[:count]]
+
+        for position, value in zip(positions[:count], fitness[:count]):
+            self.evaluations += 1
+            if value > self.gbest_fitness:
+                self.gbest_fitness = float(value)
+                self.gbest_position = position.copy()
+                self._update_best_solutions(self.gbest_position, self.gbest_fitness)
+                self.history.append((self.evaluations, self.gbest_fitness))
+        return fitness
+
+    def _run(self):
+        raise NotImplementedError
+
+    def optimize(self):
+        """执行优化过程，返回值与 AdaptivePSOWithSA.optimize 相同"""
+        start_time = time.time()
+        try:
+            self._run()
+        except _BudgetExhausted:
+            pass
+        self.elapsed_time = time.time() - start_time
+        return self.gbest_position, self.gbest_fitness, self.best_solutions
+
+    def evaluations_to_reach(self, target_fitness):
+        """返回最优值首次达到 target_fitness 时的评估次数，未达到时返回 None"""
+        for evaluations, fitness in self.history:
+            if fitness >= target_fitness:
+                return evaluations
+        return None
+
+    def report(self):
+        """返回本次运行的摘要"""
+        return {
+            'backend': self.name,
+            'evaluations': self.evaluations,
+            'best_fitness': float(self.gbest_fitness),
+            'best_position': None if self.gbest_position is None else [float(value) for value in self.gbest_position],
+            'elapsed_seconds': self.elapsed_time,
+            'history': [(int(evaluations), float(fitness)) for evaluations, fitness in self.history],
+        }
+
+
+class PSOSAOptimizer(OptimizerBase):
+    """将 AdaptivePSOWithSA 接入公共接口，评估经由 OptimizerBase.evaluate 计数"""
+    name = 'pso_sa'
+
+    def __init__(self, fitness_function, param_bounds, num_particles=30, max_iterations=100, **kwargs):
+        super().__init__(fitness_function, param_bounds, **kwargs)
+        self.num_particles = num_particles
+        self.max_iterations = max_iterations
+
+    def _run(self):
+        # 每次迭代的粒子群和模拟退火邻域解各整批评估一次，与其他后端共用批量路径
+        pso_sa = AdaptivePSOWithSA(
+            fitness_function=lambda position: self.evaluate(position)[0],
+            param_bounds=self.param_bounds,
+            num_particles=self.num_particles,
+            max_iterations=self.max_iterations,
+            initial_solutions=[list(solution) for solution in self.initial_solutions],
+            batch_fitness_function=self.evaluate
+        )
+        pso_sa.optimize()
+
+
+class CMAESOptimizer(OptimizerBase):
+    """
+    协方差矩阵自适应进化策略 (CMA-ES)，在归一化到 [0, 1] 的参数空间中搜索，
+    越界样本裁剪回边界后再评估和更新。
+    """
+    name = 'cmaes'
+
+    def __init__(self, fitness_function, param_bounds, max_evaluations=3000, population_size=None,
+                 sigma0=0.3, **kwargs):
+        """
+        :param population_size: 每代样本数，默认 4 + 3 ln(d)
+        :param sigma0: 初始步长（相对于参数区间宽度）
+        """
+        super().__init__(fitness_function, param_bounds, max_evaluations=max_evaluations, **kwargs)
+        self.population_size = population_size or 4 + int(3 * math.log(self.dimensions))
+        self.sigma0 = sigma0
+
+    def _run(self):
+        n = self.dimensions
+        lam = self.population_size
+        mu = lam // 2
+        weights = np.log(mu + 0.5) - np.log(np.arange(1, mu + 1))
+        weights /= weights.sum()
+        mueff = 1 / np.sum(weights ** 2)
+
+        # 标准的步长与协方差学习率
+        cc = (4 + mueff / n) / (n + 4 + 2 * mueff / n)
+        cs = (mueff + 2) / (n + mueff + 5)
+        c1 = 2 / ((n + 1.3) ** 2 + mueff)
+        cmu = min(1 - c1, 2 * (mueff - 2 + 1 / mueff) / ((n + 2) ** 2 + mueff))
+        damps = 1 + 2 * max(0, math.sqrt((mueff - 1) / (n + 1)) - 1) + cs
+        chi_n = math.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n ** 2))
+
+        scale = self.upper - self.lower
+        if self.initial_solutions:
+            initial = np.array(self.initial_solutions)
+            fitness = self.evaluate(initial)
+            mean = (initial[np.argmax(fitness)] - self.lower) / scale
+        else:
+            mean = np.full(n, 0.5)
+
+        sigma = self.sigma0
+        pc = np.zeros(n)
+        ps = np.zeros(n)
+        B = np.eye(n)
+        D = np.ones(n)
+        C = np.eye(n)
+        generation = 0
+
+        while not self.should_stop():
+            z = np.random.standard_normal((lam, n))
+            samples = np.clip(mean + sigma * (z * D) @ B.T, 0, 1)
+            fitness = self.evaluate(self.lower + samples * scale)
+
+            # 按适应度从大到小选出前 mu 个样本
+            order = np.argsort(-fitness)[:mu]
+            selected = (samples[order] - mean) / sigma
+            y_w = weights @ selected
+            mean = mean + sigma * y_w
+
+            C_inv_sqrt = B @ np.diag(1 / D) @ B.T
+            ps = (1 - cs) * ps + math.sqrt(cs * (2 - cs) * mueff) * C_inv_sqrt @ y_w
+            hsig = (np.linalg.norm(ps) / math.sqrt(1 - (1 - cs) ** (2 * (generation + 1))) / chi_n
+                    < 1.4 + 2 / (n + 1))
+            pc = (1 - cc) * pc + hsig * math.sqrt(cc * (2 - cc) * mueff) * y_w
+            C = ((1 - c1 - cmu) * C
+                 + c1 * (np.outer(pc, pc) + (1 - hsig) * cc * (2 - cc) * C)
+                 + cmu * (selected.T * weights) @ selected)
+            # 覆盖时间大面积为 0 时步长会持续增大，限制在整个区间宽度以内
+            sigma = min(sigma * math.exp((cs / damps) * (np.linalg.norm(ps) / chi_n - 1)), 1.0)
+
+            C = (C + C.T) / 2
+            eigenvalues, B = np.linalg.eigh(C)
+            D = np.sqrt(np.maximum(eigenvalues, 1e-20))
+            generation += 1
+
+            if self.verbose:
+                print(f"CMA-ES generation {generation}, evaluations {self.evaluations}, "
+                      f"Best Fitness: {self.gbest_fitness}, sigma: {sigma:.4g}")
+            if sigma * D.max() < 1e-12:
+                break
+
+
+class DifferentialEvolutionOptimizer(OptimizerBase):
+    """差分进化 (DE/rand/1/bin)，每代的试验种群整批评估"""
+    name = 'de'
+
+    def __init__(self, fitness_function, param_bounds, max_evaluations=3000, population_size=15,
+                 mutation=0.6, crossover=0.9, **kwargs):
+        """
+        :param population_size: 种群大小
+        :param mutation: 差分缩放因子 F
+        :param crossover: 交叉概率 CR
+        """
+        super().__init__(fitness_function, param_bounds, max_evaluations=max_evaluations, **kwargs)
+        self.population_size = population_size
+        self.mutation = mutation
+        self.crossover = crossover
+
+    def _run(self):
+        size = self.population_size
+        population = self.random_positions(size)
+        for i, initial_solution in enumerate(self.initial_solutions[:size]):
+            population[i] = initial_solution
+        fitness = self.evaluate(population)
+        generation = 0
+
+        while not self.should_stop():
+            # 为每个个体选出三个互不相同且不同于自身的个体
+            donors = np.array([np.random.choice([j for j in range(size) if j != i], 3, replace=False)
+                               for i in range(size)])
+            mutants = population[donors[:, 0]] + self.mutation * (population[donors[:, 1]] - population[donors[:, 2]])
+
+            cross = np.random.random((size, self.dimensions)) < self.crossover
+            cross[np.arange(size), np.random.randint(self.dimensions, size=size)] = True
+            trials = self.clip(np.where(cross, mutants, population))
+
+            trial_fitness = self.evaluate(trials)
+            improved = trial_fitness >= fitness
+            population[improved] = trials[improved]
+            fitness[improved] = trial_fitness[improved]
+            generation += 1
+
+            if self.verbose:
+                print(f"DE generation {generation}, evaluations {self.evaluations}, Best Fitness: {self.gbest_fitness}")
+
+
+OPTIMIZER_BACKENDS = {
+    PSOSAOptimizer.name: PSOSAOptimizer,
+    CMAESOptimizer.name: CMAESOptimizer,
+    DifferentialEvolutionOptimizer.name: DifferentialEvolutionOptimizer,
+}
+
+
+def create_optimizer(backend, fitness_function, param_bounds, **options):
+    """
+    按名称创建优化器。
+
+    参数：
+    backend: 'pso_sa' / 'cmaes' / 'de'
+    options: 传给对应后端构造函数的参数
+
+    返回：
+    optimizer: OptimizerBase 子类实例
+    """
+    if backend not in OPTIMIZER_BACKENDS:
+        raise ValueError(f"未知的优化器后端: {backend}，可选: {', '.join(OPTIMIZER_BACKENDS)}")
+    return OPTIMIZER_BACKENDS[backend](fitness_function, param_bounds, **options)
+
+
+def create_parallel_batch_fitness(fitness_function, executor):
+    """用进程池/线程池的 map 构造批量适应度函数，fitness_function 需可被 pickle"""
+    def batch_fitness_function(positions):
+        return list(executor.map(fitness_function, positions))
+    return batch_fitness_function
+
+
+def benchmark_optimizers(fitness_function, param_bounds, backends=None, max_evaluations=3000,
+                         target_fitness=None, seed=None, **options):
+    """
+    在相同评估预算下依次运行多个后端，便于比较达到同一覆盖时间所需的评估次数。
+
+    参数：
+    backends: 后端名称列表，默认全部
+    max_evaluations: 每个后端的评估预算
+    target_fitness: 不为 None 时统计首次达到该值的评估次数
+    seed: 每个后端运行前重置的随机种子
+    options: 传给各后端的公共参数 (initial_solutions, batch_fitness_function, verbose)
+
+    返回：
+    reports: 各后端的 report()，附加 evaluations_to_target
+    """
+    reports = []
+    for backend in backends or list(OPTIMIZER_BACKENDS):
+        if seed is not None:
+            np.random.seed(seed)
+            random.seed(seed)
+        optimizer = create_optimizer(backend, fitness_function, param_bounds,
+                                     max_evaluations=max_evaluations, **options)
+        optimizer.optimize()
+        report = optimizer.report()
+        if target_fitness is not None:
+            report['evaluations_to_target'] = optimizer.evaluations_to_reach(target_fitness)
+        reports.append(report)
+    return reports
@@ -0,0 +1,237 @@
+import sys
+import os
+import json
+import time
+import random
+import argparse
+import contextlib
+import traceback
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from q2.scenario import (load_scenario, scenario_positions, coverage_kwargs_from_scenario,
+                         optimizer_options_from_scenario, smooth_kwargs_from_scenario)
+from q2.smooth_coverage import polish_solution
+from q2.main_optimization import create_fitness_function
+from q2.optimizers import create_optimizer
+from q2.calculate_effective_coverage_time import (calculate_effective_coverage_time_for_optimization,
+                                                  write_coverage_time_series)
+
+SCENARIO_EXTENSIONS = ('.json', '.toml')
+PARAM_NAMES = ['flight_speed', 'drop_time', 'explosion_delay', 'theta']
+
+
+def collect_scenario_files(paths):
+    """展开命令行给出的文件与目录，返回排好序的场景文件列表"""
+    scenario_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for file_name in sorted(os.listdir(path)):
+                if file_name.lower().endswith(SCENARIO_EXTENSIONS):
+                    scenario_files.append(os.path.join(path, file_name))
+        else:
+            scenario_files.append(path)
+    return scenario_files
+
+
+def _params_to_dict(params):
+    """将 [flight_speed, drop_time, explosion_delay, theta] 转为带方向向量的字典"""
+    result = {name: float(value) for name, value in zip(PARAM_NAMES, params)}
+    theta_rad = np.radians(result['theta'])
+    result['direction_x'] = float(np.cos(theta_rad))
+    result['direction_y'] = float(np.sin(theta_rad))
+    return result
+
+
+def _evaluate_params(scenario, params):
+    """
+    计算给定参数下的有效遮蔽时间。
+    不经过 coverage_fitness，计算中的异常直接抛出，由 run_scenario_file 记为 status: error。
+    """
+    drone_initial_position, missile_initial_position = scenario_positions(scenario)
+    flight_speed, drop_time, explosion_delay, theta = params
+    theta_rad = np.radians(theta)
+    return calculate_effective_coverage_time_for_optimization(
+        [flight_speed, drop_time, explosion_delay, np.cos(theta_rad), np.sin(theta_rad)],
+        drone_initial_position, missile_initial_position,
+        **coverage_kwargs_from_scenario(scenario))
+
+
+def _write_time_series(scenario, params, time_series_path):
+    """将给定参数下的逐时刻遮蔽结果写入 CSV，返回有效遮蔽时间"""
+    drone_initial_position, missile_initial_position = scenario_positions(scenario)
+    flight_speed, drop_time, explosion_delay, theta = params
+    theta_rad = np.radians(theta)
+    flight_direction = np.array([np.cos(theta_rad), np.sin(theta_rad), 0])
+    return write_coverage_time_series(
+        time_series_path, drone_initial_position, missile_initial_position,
+        flight_speed, drop_time, explosion_delay, flight_direction,
+        **coverage_kwargs_from_scenario(scenario))
+
+
+def run_scenario(scenario, time_series_path=None):
+    """
+    运行单个场景：给出 params 时只计算遮蔽时间，否则用 optimizer.backend 指定的后端优化。
+
+    参数：
+    scenario: load_scenario 返回的场景字典
+    time_series_path: 不为 None 时，将最佳参数下的逐时刻遮蔽结果写入该 CSV 文件
+
+    返回：
+    result: 可直接写成 JSON 的结果字典
+    """
+    seed = scenario['optimizer']['seed']
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+
+    if scenario['params'] is not None:
+        if time_series_path is not None:
+            # 同一次计算同时给出遮蔽时间和逐时刻序列
+            coverage_time = _write_time_series(scenario, scenario['params'], time_series_path)
+        else:
+            coverage_time = _evaluate_params(scenario, scenario['params'])
+        return {
+            'mode': 'evaluate',
+            'best_fitness': float(coverage_time),
+            'best_params': _params_to_dict(scenario['params']),
+            'best_solutions': [],
+        }
+
+    drone_initial_position, missile_initial_position = scenario_positions(scenario)
+    fitness_function = create_fitness_function(
+        drone_initial_position, missile_initial_position,
+        **coverage_kwargs_from_scenario(scenario))
+    optimizer = create_optimizer(
+        scenario['optimizer']['backend'], fitness_function,
+        [tuple(bound) for bound in scenario['param_bounds']],
+        **optimizer_options_from_scenario(scenario))
+    best_position, best_fitness, best_solutions = optimizer.optimize()
+    report = optimizer.report()
+
+    # 精修结果单独记录：best_fitness 为蒙特卡洛遮蔽时间，polish.fitness 为连续遮蔽时间
+    final_position = best_position
+    polish = None
+    if scenario['optimizer']['polish']:
+        polished_position, polished_fitness, polish_info = polish_solution(
+            best_position, [tuple(bound) for bound in scenario['param_bounds']],
+            drone_initial_position, missile_initial_position,
+            **smooth_kwargs_from_scenario(scenario))
+        polish = dict(polish_info, params=_params_to_dict(polished_position), fitness=polished_fitness)
+        if not polish_info['success']:
+            print(f"警告: 精修未收敛 ({polish_info['message']})，保留不劣于起点的结果")
+        final_position = polished_position
+
+    if time_series_path is not None:
+        _write_time_series(scenario, final_position, time_series_path)
+    return {
+        'mode': 'optimize',
+        'backend': report['backend'],
+        'evaluations': report['evaluations'],
+        'history': report['history'],
+        'best_fitness': float(best_fitness),
+        'best_params': _params_to_dict(best_position),
+        'polish': polish,
+        'best_solutions': [
+            {'fitness': float(solution['fitness']), 'params': _params_to_dict(solution['params'])}
+            for solution in best_solutions
+        ],
+    }
+
+
+def run_scenario_file(scenario_path, output_dir, time_series=False):
+    """
+    在工作进程中运行一个场景文件，结果写入 output_dir/<场景名>.json，
+    运行过程中的打印输出重定向到 output_dir/<场景名>.log，
+    time_series 为 True 时逐时刻遮蔽结果写入 output_dir/<场景名>_series.csv。
+
+    返回：
+    (scenario_path, result_path, status)
+    """
+    stem = os.path.splitext(os.path.basename(scenario_path))[0]
+    result_path = os.path.join(output_dir, stem + '.json')
+    log_path = os.path.join(output_dir, stem + '.log')
+    time_series_path = os.path.join(output_dir, stem + '_series.csv') if time_series else None
+
+    start_time = time.time()
+    with open(log_path, 'w', encoding='utf-8') as log_file, contextlib.redirect_stdout(log_file):
+        try:
+            scenario = load_scenario(scenario_path)
+            result = run_scenario(scenario, time_series_path=time_series_path)
+            result['status'] = 'ok'
+            result['name'] = scenario['name']
+        except Exception as e:
+            # 单个场景失败不影响整批任务，错误信息写入结果文件
+            traceback.print_exc(file=log_file)
+            result = {'status': 'error', 'name': stem, 'error': f"{type(e).__name__}: {e}"}
+    result['scenario_file'] = os.path.abspath(scenario_path)
+    if time_series_path is not None and result['status'] == 'ok':
+        result['time_series_file'] = os.path.abspath(time_series_path)
+    result['elapsed_seconds'] = time.time() - start_time
+
+    with open(result_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    return scenario_path, result_path, result['status']
+
+
+def run_batch(scenario_files, output_dir, workers=None, skip_existing=False, time_series=False):
+    """
+    使用进程池并行运行一批场景文件。
+
+    参数：
+    scenario_files: 场景文件路径列表
+    output_dir: 结果输出目录
+    workers: 工作进程数，默认为 CPU 核数
+    skip_existing: 为 True 时跳过已有结果文件的场景，便于中断后续跑
+    time_series: 为 True 时为每个场景额外输出逐时刻遮蔽结果
+
+    返回：
+    failed: 运行失败的场景文件列表
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if skip_existing:
+        scenario_files = [
+            path for path in scenario_files
+            if not os.path.exists(os.path.join(output_dir, os.path.splitext(os.path.basename(path))[0] + '.json'))
+        ]
+
+    stems = [os.path.splitext(os.path.basename(path))[0] for path in scenario_files]
+    if len(set(stems)) != len(stems):
+        raise ValueError("场景文件名（不含后缀）必须唯一，否则结果文件会互相覆盖")
+
+    print(f"共 {len(scenario_files)} 个场景，使用 {workers or os.cpu_count()} 个工作进程")
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_scenario_file, path, output_dir, time_series) for path in scenario_files]
+        for i, future in enumerate(as_completed(futures)):
+            scenario_path, result_path, status = future.result()
+            print(f"[{i + 1}/{len(futures)}] {scenario_path} -> {result_path} ({status})")
+            if status != 'ok':
+                failed.append(scenario_path)
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="从 JSON/TOML 场景文件批量计算烟幕遮蔽时间或执行优化")
+    parser.add_argument('scenarios', nargs='+', help="场景文件或包含场景文件的目录")
+    parser.add_argument('-o', '--output-dir', default='results', help="结果输出目录 (默认: results)")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="并行工作进程数 (默认: CPU 核数)")
+    parser.add_argument('--skip-existing', action='store_true', help="跳过已有结果文件的场景")
+    parser.add_argument('--time-series', action='store_true', help="额外输出最佳参数下的逐时刻遮蔽结果 (CSV)")
+    args = parser.parse_args(argv)
+
+    scenario_files = collect_scenario_files(args.scenarios)
+    failed = run_batch(scenario_files, args.output_dir, workers=args.workers, skip_existing=args.skip_existing,
+                       time_series=args.time_series)
+    if failed:
+        print(f"{len(failed)} 个场景运行失败:")
+        for path in failed:
+            print(f"  {path}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,271 @@
+import sys
+import os
+import json
+import copy
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+try:
+    import tomllib  # Python 3.11+
+except ImportError:  # pragma: no cover
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+from q2.main_optimization import PARAM_BOUNDS, INITIAL_SOLUTIONS
+from q2.optimizers import OPTIMIZER_BACKENDS
+from utils.judge_cross_by_point_pick import minimum_samples_to_cover
+from utils.coverage_kernels import check_engine
+
+# 场景文件的默认值，与第二问的原始设定保持一致
+DEFAULT_SCENARIO = {
+    'name': None,
+    'drone_initial_position': [17800, 0, 1800],
+    'missile_initial_position': [20000, 0, 2000],
+    'missile_speed': 300,
+    # 固定参数 [flight_speed, drop_time, explosion_delay, theta]，给出时只计算遮蔽时间，不做优化
+    'params': None,
+    'param_bounds': [list(bound) for bound in PARAM_BOUNDS],
+    'initial_solutions': [list(solution) for solution in INITIAL_SOLUTIONS],
+    'smoke': {
+        'radius': 10,        # 烟幕有效遮蔽半径 (m)
+        'lifetime': 20,      # 烟幕有效持续时间 (s)
+        'sink_speed': 3,     # 引爆后的下沉速度 (m/s)
+    },
+    'time_grid': {
+        'start': 0,
+        'stop': 50,
+        'count': 50000,
+    },
+    'sampling': {
+        'num': 200,          # 每个时刻在圆柱侧面上的采样点数（自适应模式下为采样上限）
+        'adaptive': False,   # 是否使用分轮自适应采样
+        'tolerance': 0.02,   # 自适应模式下允许的未遮蔽面积占比
+        'confidence': 0.95,  # 自适应模式下的目标置信度
+        'engine': 'reference',  # 'reference' / 'auto' / 'numba' / 'numpy'，见 calculate_effective_coverage_time
+    },
+    'optimizer': {
+        'backend': 'pso_sa',       # 'pso_sa' / 'cmaes' / 'de'
+        'num_particles': 30,       # 仅 pso_sa
+        'max_iterations': 100,     # 仅 pso_sa
+        'population_size': None,   # 仅 cmaes / de，None 使用后端默认值
+        'max_evaluations': None,   # 适应度评估次数上限，None 时 pso_sa 不限制，其余后端为 3000
+        'target_fitness': None,    # 达到该有效遮蔽时间后提前停止
+        'polish': True,            # 优化结束后在连续遮蔽时间上做局部精修
+        'seed': None,
+    },
+}
+
+
+def _merge(defaults, overrides, path):
+    """递归合并场景配置，遇到未知字段时报错，避免拼写错误被静默忽略"""
+    merged = copy.deepcopy(defaults)
+    for key, value in overrides.items():
+        if key not in defaults:
+            raise ValueError(f"未知的场景字段: {path}{key}")
+        if isinstance(defaults[key], dict):
+            if not isinstance(value, dict):
+                raise ValueError(f"场景字段 {path}{key} 应为表/对象")
+            merged[key] = _merge(defaults[key], value, f"{path}{key}.")
+        else:
+            merged[key] = value
+    return merged
+
+
+def _require_number(value, path, integer=False, allow_none=False):
+    """检查字段是否为数值（integer 为 True 时要求整数），bool 不算数值"""
+    if value is None and allow_none:
+        return
+    expected = int if integer else (int, float)
+    if isinstance(value, bool) or not isinstance(value, expected):
+        raise ValueError(f"场景字段 {path} 应为{'整数' if integer else '数值'}，实际为 {value!r}")
+
+
+def _require_numbers(values, path, length):
+    """检查数组字段的长度及其中每个元素均为数值"""
+    if not isinstance(values, (list, tuple)) or len(values) != length:
+        raise ValueError(f"场景字段 {path} 应为长度为 {length} 的数组")
+    for i, value in enumerate(values):
+        _require_number(value, f"{path}[{i}]")
+
+
+def _validate(scenario):
+    """检查场景中各字段的类型、长度和取值范围"""
+    for key in ('drone_initial_position', 'missile_initial_position'):
+        _require_numbers(scenario[key], key, 3)
+    _require_number(scenario['missile_speed'], 'missile_speed')
+    if scenario['missile_speed'] <= 0:
+        raise ValueError("missile_speed 必须大于 0")
+
+    smoke = scenario['smoke']
+    for key in ('radius', 'lifetime', 'sink_speed'):
+        _require_number(smoke[key], f"smoke.{key}")
+    if smoke['radius'] <= 0:
+        raise ValueError("smoke.radius 必须大于 0")
+    if smoke['lifetime'] <= 0:
+        raise ValueError("smoke.lifetime 必须大于 0")
+    if smoke['sink_speed'] < 0:
+        raise ValueError("smoke.sink_speed 不能为负")
+
+    time_grid = scenario['time_grid']
+    _require_number(time_grid['start'], 'time_grid.start')
+    _require_number(time_grid['stop'], 'time_grid.stop')
+    _require_number(time_grid['count'], 'time_grid.count', integer=True)
+    if time_grid['stop'] <= time_grid['start']:
+        raise ValueError("time_grid.stop 必须大于 time_grid.start")
+    if time_grid['count'] < 2:
+        raise ValueError("time_grid.count 至少为 2")
+
+    if len(scenario['param_bounds']) != 4:
+        raise ValueError("param_bounds 必须包含 4 个区间 [flight_speed, drop_time, explosion_delay, theta]")
+    for i, bound in enumerate(scenario['param_bounds']):
+        _require_numbers(bound, f"param_bounds[{i}]", 2)
+        min_val, max_val = bound
+        if min_val > max_val:
+            raise ValueError(f"param_bounds 区间非法: ({min_val}, {max_val})")
+    for i, solution in enumerate(scenario['initial_solutions']):
+        if not isinstance(solution, (list, tuple)) or len(solution) != 4:
+            raise ValueError("initial_solutions 中每个初始解必须包含 4 个参数")
+        _require_numbers(solution, f"initial_solutions[{i}]", 4)
+    if scenario['params'] is not None:
+        if not isinstance(scenario['params'], (list, tuple)) or len(scenario['params']) != 4:
+            raise ValueError("params 必须包含 4 个参数 [flight_speed, drop_time, explosion_delay, theta]")
+        _require_numbers(scenario['params'], 'params', 4)
+
+    optimizer = scenario['optimizer']
+    if optimizer['backend'] not in OPTIMIZER_BACKENDS:
+        raise ValueError(f"未知的优化器后端: {optimizer['backend']}")
+    for key in ('num_particles', 'max_iterations'):
+        _require_number(optimizer[key], f"optimizer.{key}", integer=True)
+    for key in ('population_size', 'max_evaluations', 'seed'):
+        _require_number(optimizer[key], f"optimizer.{key}", integer=True, allow_none=True)
+    _require_number(optimizer['target_fitness'], 'optimizer.target_fitness', allow_none=True)
+    for key in ('num_particles', 'max_iterations', 'population_size', 'max_evaluations'):
+        if optimizer[key] is not None and optimizer[key] < 1:
+            raise ValueError(f"optimizer.{key} 至少为 1")
+    if not isinstance(optimizer['polish'], bool):
+        raise ValueError("optimizer.polish 应为 true 或 false")
+
+    sampling = scenario['sampling']
+    _require_number(sampling['num'], 'sampling.num', integer=True)
+    if sampling['num'] < 1:
+        raise ValueError("sampling.num 至少为 1")
+    if not isinstance(sampling['adaptive'], bool):
+        raise ValueError("sampling.adaptive 应为 true 或 false")
+    _require_number(sampling['tolerance'], 'sampling.tolerance')
+    _require_number(sampling['confidence'], 'sampling.confidence')
+    if sampling['adaptive'] and not 0 < sampling['tolerance'] < 1:
+        raise ValueError("sampling.tolerance 必须在 0 与 1 之间（不含端点）")
+    if sampling['adaptive'] and not 0 < sampling['confidence'] < 1:
+        raise ValueError("sampling.confidence 必须在 0 与 1 之间（不含端点）")
+    check_engine(sampling['engine'], sampling['adaptive'])
+    if sampling['adaptive'] and sampling['num'] < minimum_samples_to_cover(sampling['tolerance'], sampling['confidence']):
+        raise ValueError(
+            f"sampling.num={sampling['num']} 不足以在 tolerance={sampling['tolerance']} 下以 "
+            f"{sampling['confidence']} 的置信度判定遮蔽，至少需要 "
+            f"{minimum_samples_to_cover(sampling['tolerance'], sampling['confidence'])} 个采样点")
+
+
+def parse_scenario(data, name=None):
+    """
+    将场景字典与默认值合并并校验。
+
+    参数：
+    data: 从 JSON/TOML 读取的场景字典
+    name: 场景名称，data 中未给出 name 时使用
+
+    返回：
+    scenario: 完整的场景字典
+    """
+    scenario = _merge(DEFAULT_SCENARIO, data, '')
+    if scenario['name'] is None:
+        scenario['name'] = name
+    _validate(scenario)
+    return scenario
+
+
+def load_scenario(path):
+    """
+    从 JSON 或 TOML 文件读取场景。
+
+    参数：
+    path: 场景文件路径，后缀为 .json 或 .toml
+
+    返回：
+    scenario: 完整的场景字典
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.json':
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    elif extension == '.toml':
+        if tomllib is None:
+            raise RuntimeError("读取 TOML 场景需要 Python 3.11+ 或安装 tomli")
+        with open(path, 'rb') as f:
+            data = tomllib.load(f)
+    else:
+        raise ValueError(f"不支持的场景文件格式: {path}")
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    return parse_scenario(data, name=name)
+
+
+def build_time_range(scenario):
+    """根据场景的时间网格生成时间序列"""
+    time_grid = scenario['time_grid']
+    return np.linspace(time_grid['start'], time_grid['stop'], time_grid['count'])
+
+
+def scenario_positions(scenario):
+    """返回场景中无人机与导弹的初始位置 (np.array)"""
+    drone_initial_position = np.array(scenario['drone_initial_position'], dtype=float)
+    missile_initial_position = np.array(scenario['missile_initial_position'], dtype=float)
+    return drone_initial_position, missile_initial_position
+
+
+def optimizer_options_from_scenario(scenario):
+    """将场景的 optimizer 表转换为 create_optimizer 的参数"""
+    optimizer = scenario['optimizer']
+    options = {
+        'initial_solutions': scenario['initial_solutions'],
+        'target_fitness': optimizer['target_fitness'],
+    }
+    if optimizer['max_evaluations'] is not None:
+        options['max_evaluations'] = optimizer['max_evaluations']
+    if optimizer['backend'] == 'pso_sa':
+        options['num_particles'] = optimizer['num_particles']
+        options['max_iterations'] = optimizer['max_iterations']
+    elif optimizer['population_size'] is not None:
+        options['population_size'] = optimizer['population_size']
+    return options
+
+
+def smooth_kwargs_from_scenario(scenario):
+    """将场景转换为 q2.smooth_coverage 中连续遮蔽时间函数的关键字参数"""
+    smoke = scenario['smoke']
+    return {
+        'radius': smoke['radius'],
+        'smoke_lifetime': smoke['lifetime'],
+        'sink_speed': smoke['sink_speed'],
+        'missile_speed': scenario['missile_speed'],
+        'time_window': (scenario['time_grid']['start'], scenario['time_grid']['stop']),
+    }
+
+
+def coverage_kwargs_from_scenario(scenario):
+    """将场景转换为 calculate_effective_coverage_time 的关键字参数"""
+    smoke = scenario['smoke']
+    return {
+        'radius': smoke['radius'],
+        'time_range': build_time_range(scenario),
+        'smoke_lifetime': smoke['lifetime'],
+        'sink_speed': smoke['sink_speed'],
+        'missile_speed': scenario['missile_speed'],
+        'num': scenario['sampling']['num'],
+        'adaptive': scenario['sampling']['adaptive'],
+        'tolerance': scenario['sampling']['tolerance'],
+        'confidence': scenario['sampling']['confidence'],
+        'engine': scenario['sampling']['engine'],
+    }
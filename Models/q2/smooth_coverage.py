@@ -0,0 +1,317 @@
+import sys
+import os
+import numpy as np
+from scipy.optimize import brentq, minimize
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 真目标：底面圆心 (0, 200, 0)，半径 7 m，高 10 m 的圆柱，与 judge_cross_by_point_pick 中的采样一致
+TARGET_CENTER = np.array([0.0, 200.0, 0.0])
+TARGET_RADIUS = 7
+TARGET_HEIGHT = 10
+GRAVITY = 9.81
+# 默认时间窗口，与 calculate_effective_coverage_time 的默认时间序列（0 到 50 秒）一致
+DEFAULT_TIME_WINDOW = (0, 50)
+# 遮蔽区间端点的类型：裕度零点、烟幕起爆/消散时刻、时间窗口边界
+ENDPOINT_ROOT = 'root'
+ENDPOINT_SMOKE = 'smoke'
+ENDPOINT_WINDOW = 'window'
+# 精修目标函数的缩放系数：目标 e - s 是线性的，SLSQP 初始以单位矩阵近似 Hessian，
+# 首步长度与梯度同量级，不缩放时第一步就可能跳到遮蔽时间更差的区域；
+# 缩放只缩短首步，之后的步长由 BFGS 更新决定，并不限制精修离起点的距离
+POLISH_OBJECTIVE_SCALE = 0.1
+
+
+def target_surface_points(num_theta=72, num_height=6):
+    """在圆柱侧面上取规则网格点（包括上下边缘），代替蒙特卡洛随机采样"""
+    theta = np.linspace(0, 2 * np.pi, num_theta, endpoint=False)
+    height = np.linspace(0, TARGET_HEIGHT, num_height)
+    theta, height = np.meshgrid(theta, height)
+    points = np.stack([
+        TARGET_CENTER[0] + TARGET_RADIUS * np.cos(theta.ravel()),
+        TARGET_CENTER[1] + TARGET_RADIUS * np.sin(theta.ravel()),
+        TARGET_CENTER[2] + height.ravel(),
+    ], axis=1)
+    return points
+
+
+def _trajectories(params, drone_initial_position, missile_initial_position, sink_speed, missile_speed):
+    """返回起爆时刻以及按时间向量化计算导弹、烟幕位置的函数，运动模型与 utils.motion 一致"""
+    flight_speed, drop_time, explosion_delay, theta = params
+    theta_rad = np.radians(theta)
+    flight_direction = np.array([np.cos(theta_rad), np.sin(theta_rad), 0.0])
+
+    drop_position = drone_initial_position + flight_direction * flight_speed * drop_time
+    explosion_position = drop_position + flight_direction * flight_speed * explosion_delay
+    explosion_position[2] = drop_position[2] - 0.5 * GRAVITY * explosion_delay ** 2
+    explosion_time = drop_time + explosion_delay
+
+    # 导弹飞向假目标（原点）
+    unit_direction = -missile_initial_position / np.linalg.norm(missile_initial_position)
+
+    def positions(t):
+        t = np.atleast_1d(np.asarray(t, dtype=float))
+        missile_positions = missile_initial_position + unit_direction * missile_speed * t[:, None]
+        smoke_positions = np.repeat(explosion_position[None, :], len(t), axis=0)
+        smoke_positions[:, 2] -= sink_speed * (t - explosion_time)
+        return missile_positions, smoke_positions
+
+    return explosion_time, positions
+
+
+def occlusion_margin(missile_positions, smoke_positions, radius, surface_points):
+    """
+    计算遮蔽裕度：烟幕半径减去球心到“导弹-目标表面点”线段的最大距离。
+
+    某个表面点被遮挡当且仅当导弹到该点的线段穿过烟幕球；裕度 > 0 表示所有表面点都被遮挡。
+    导弹位于烟幕球内时线段距离为 0，裕度为 radius，与距离判断一致。
+    裕度随时间和参数连续变化，其零点即为遮蔽区间的端点。
+
+    参数：
+    missile_positions: (T, 3)
+    smoke_positions: (T, 3)
+    surface_points: (K, 3)
+
+    返回：
+    margin: (T,)
+    """
+    segment = surface_points[None, :, :] - missile_positions[:, None, :]
+    to_center = (smoke_positions - missile_positions)[:, None, :]
+    s = np.clip(np.sum(to_center * segment, axis=2) / np.sum(segment * segment, axis=2), 0, 1)
+    closest = missile_positions[:, None, :] + s[:, :, None] * segment
+    distance = np.linalg.norm(smoke_positions[:, None, :] - closest, axis=2)
+    return radius - distance.max(axis=1)
+
+
+def _occlusion_intervals(params, drone_initial_position, missile_initial_position,
+                         radius, smoke_lifetime, sink_speed, missile_speed,
+                         time_step, surface_points, xtol, time_window):
+    """求遮蔽区间，端点为 (时刻, 端点类型) 的形式，只统计烟幕有效期与时间窗口的交集"""
+    explosion_time, positions = _trajectories(params, drone_initial_position, missile_initial_position,
+                                              sink_speed, missile_speed)
+
+    def margin_at(t):
+        missile_positions, smoke_positions = positions(t)
+        return occlusion_margin(missile_positions, smoke_positions, radius, surface_points)
+
+    window_start, window_stop = time_window
+    start_time, start_kind = explosion_time, ENDPOINT_SMOKE
+    if window_start > start_time:
+        start_time, start_kind = window_start, ENDPOINT_WINDOW
+    end_time, end_kind = explosion_time + smoke_lifetime, ENDPOINT_SMOKE
+    if window_stop < end_time:
+        end_time, end_kind = window_stop, ENDPOINT_WINDOW
+    if end_time <= start_time:
+        return []
+
+    count = max(int(np.ceil((end_time - start_time) / time_step)), 1) + 1
+    grid = np.linspace(start_time, end_time, count)
+    margin = margin_at(grid)
+    occluded = margin > 0
+
+    intervals = []
+    interval_start = (start_time, start_kind) if occluded[0] else None
+    for i in np.nonzero(occluded[1:] != occluded[:-1])[0]:
+        crossing = brentq(lambda t: margin_at(t)[0], grid[i], grid[i + 1], xtol=xtol)
+        if occluded[i + 1]:
+            interval_start = (crossing, ENDPOINT_ROOT)
+        else:
+            intervals.append((interval_start, (crossing, ENDPOINT_ROOT)))
+            interval_start = None
+    if interval_start is not None:
+        intervals.append((interval_start, (end_time, end_kind)))
+    return intervals
+
+
+def _scenario_arguments(drone_initial_position, missile_initial_position, radius=10, smoke_lifetime=20,
+                        sink_speed=3, missile_speed=300, time_step=0.01, surface_points=None, xtol=1e-12,
+                        time_window=DEFAULT_TIME_WINDOW):
+    if surface_points is None:
+        surface_points = target_surface_points()
+    return (np.asarray(drone_initial_position, dtype=float), np.asarray(missile_initial_position, dtype=float),
+            radius, smoke_lifetime, sink_speed, missile_speed, time_step, surface_points, xtol,
+            tuple(float(t) for t in time_window))
+
+
+def occlusion_intervals(params, drone_initial_position, missile_initial_position, **kwargs):
+    """
+    求有效遮蔽的时间区间。
+
+    先以 time_step 为步长计算遮蔽裕度定位变号位置，再用 brentq 求出精确端点；
+    短于 time_step 且整个落在两个网格点之间的遮蔽区间可能被漏掉。
+
+    参数：
+    params: [flight_speed, drop_time, explosion_delay, theta]，theta 为角度
+    kwargs: radius, smoke_lifetime, sink_speed, missile_speed 与 calculate_effective_coverage_time 相同；
+            time_window 为 (起始时刻, 终止时刻)，对应蒙特卡洛计算所用时间序列的首末时刻，默认 (0, 50)，
+            窗口外的遮蔽不计入；
+            time_step 为定位变号的步长 (s)，surface_points 为目标表面点，xtol 为端点精度
+
+    返回：
+    intervals: [(start, end), ...]
+    """
+    arguments = _scenario_arguments(drone_initial_position, missile_initial_position, **kwargs)
+    return [(start, end) for (start, _), (end, _) in _occlusion_intervals(params, *arguments)]
+
+
+def smooth_coverage_time(params, drone_initial_position, missile_initial_position, **kwargs):
+    """由遮蔽区间端点计算的有效遮蔽时间，随参数连续变化，参数同 occlusion_intervals"""
+    intervals = occlusion_intervals(params, drone_initial_position, missile_initial_position, **kwargs)
+    return float(sum(end - start for start, end in intervals))
+
+
+def smooth_coverage_value_and_gradient(params, drone_initial_position, missile_initial_position,
+                                       steps=None, **kwargs):
+    """
+    计算连续有效遮蔽时间及其对 [flight_speed, drop_time, explosion_delay, theta] 的梯度。
+
+    梯度由隐函数定理得到：区间端点 t* 满足 margin(t*, p) = 0，故 dt*/dp = -(∂margin/∂p) / (∂margin/∂t)，
+    偏导数只需在端点处对裕度做中心差分，不必重新扫描整个时间区间；
+    端点为起爆或烟幕消散时刻时，其导数为起爆时刻 drop_time + explosion_delay 的导数；
+    端点为时间窗口边界时，其导数为 0。
+
+    注意：遮蔽时间只是分段光滑的。端点由“裕度零点”切换为“起爆时刻”（起爆即遮蔽）处有折点，
+    两侧导数可相差约 2 s/s，而第二问的最优解恰好落在这类折点上；此时返回的只是其中一侧的导数，
+    不能据此判断最优性。polish_solution 因此不使用该梯度，而是求解等价的光滑约束问题。
+
+    steps: 对参数做差分的步长，默认 1e-6 * max(1, |p|)
+
+    返回：
+    (coverage_time, gradient)
+    """
+    params = np.asarray(params, dtype=float)
+    arguments = _scenario_arguments(drone_initial_position, missile_initial_position, **kwargs)
+    drone_initial_position, missile_initial_position, radius, smoke_lifetime, sink_speed, missile_speed, \
+        time_step, surface_points, xtol, time_window = arguments
+    if steps is None:
+        steps = 1e-6 * np.maximum(1.0, np.abs(params))
+
+    def margin(p, t):
+        _, positions = _trajectories(p, drone_initial_position, missile_initial_position, sink_speed, missile_speed)
+        missile_positions, smoke_positions = positions(t)
+        return occlusion_margin(missile_positions, smoke_positions, radius, surface_points)[0]
+
+    # 起爆时刻 drop_time + explosion_delay 对参数的导数
+    explosion_time_gradient = np.array([0.0, 1.0, 1.0, 0.0])
+
+    def endpoint_gradient(t, kind):
+        if kind == ENDPOINT_WINDOW:
+            return np.zeros_like(params)
+        if kind == ENDPOINT_SMOKE:
+            return explosion_time_gradient
+        time_step_t = 1e-6 * max(1.0, abs(t))
+        dmargin_dt = (margin(params, t + time_step_t) - margin(params, t - time_step_t)) / (2 * time_step_t)
+        if dmargin_dt == 0:
+            return np.zeros_like(params)
+        dmargin_dp = np.zeros_like(params)
+        for j in range(len(params)):
+            offset = np.zeros_like(params)
+            offset[j] = steps[j]
+            dmargin_dp[j] = (margin(params + offset, t) - margin(params - offset, t)) / (2 * steps[j])
+        return -dmargin_dp / dmargin_dt
+
+    coverage_time = 0.0
+    gradient = np.zeros_like(params)
+    for (start, start_kind), (end, end_kind) in _occlusion_intervals(params, *arguments):
+        coverage_time += end - start
+        gradient += endpoint_gradient(end, end_kind) - endpoint_gradient(start, start_kind)
+    return float(coverage_time), gradient
+
+
+def smooth_coverage_gradient(params, drone_initial_position, missile_initial_position, **kwargs):
+    """smooth_coverage_time 的梯度，见 smooth_coverage_value_and_gradient"""
+    return smooth_coverage_value_and_gradient(params, drone_initial_position, missile_initial_position, **kwargs)[1]
+
+
+def polish_solution(params, param_bounds, drone_initial_position, missile_initial_position,
+                    max_iterations=100, **kwargs):
+    """
+    以全局优化得到的 gbest_position 为起点，在连续遮蔽时间上做局部精修。
+
+    遮蔽区间的起点为 max(起爆时刻, 裕度零点)，终点为 min(消散时刻, 裕度零点)，
+    最优解往往恰好落在起爆即遮蔽的折点上，遮蔽时间在此处不可导，L-BFGS-B 等梯度法会在线搜索中失败。
+    因此将起点处最长遮蔽区间的端点 s、e 也作为变量，求解等价的光滑约束问题（SLSQP）：
+        max e - s
+        s.t. margin(s, p) >= 0, margin(e, p) >= 0, 起爆时刻 <= s <= e <= 消散时刻，s、e 位于 time_window 内
+    每次函数计算只需两个时刻的遮蔽裕度，不必扫描整个时间区间。
+    参数按 param_bounds 归一化到 [0, 1]，s、e 以 smoke_lifetime 为单位，使各变量尺度相近；
+    目标函数乘以 POLISH_OBJECTIVE_SCALE 以缩短 SLSQP 的首步；精修不设信赖域，
+    沿遮蔽区间可连续延伸的方向可以走得很远（如从 q1 的 [120, 1.5, 3.6, 180] 一直走到 flight_speed 下界），
+    结果只保证不劣于起点，不保证停留在起点附近。
+    假设精修过程中该区间内部始终被遮蔽，最终结果用 smooth_coverage_time 完整扫描一次确认。
+
+    参数：
+    params: 起点 [flight_speed, drop_time, explosion_delay, theta]
+    param_bounds: 参数边界 [(min1, max1), ...]
+    max_iterations: SLSQP 最大迭代次数
+    kwargs: 场景参数，见 occlusion_intervals
+
+    返回：
+    polished_params: 精修后的参数
+    polished_coverage: 精修后的连续有效遮蔽时间 (s)
+    info: {'initial_coverage', 'evaluations', 'iterations', 'success', 'message'}，
+          evaluations 为 SLSQP 的函数计算次数（每次只计算两个时刻的裕度）；
+          精修结果不如起点而退回起点时 success 为 False
+    """
+    arguments = _scenario_arguments(drone_initial_position, missile_initial_position, **kwargs)
+    drone_initial_position, missile_initial_position, radius, smoke_lifetime, sink_speed, missile_speed, \
+        time_step, surface_points, xtol, time_window = arguments
+
+    lower = np.array([bound[0] for bound in param_bounds], dtype=float)
+    upper = np.array([bound[1] for bound in param_bounds], dtype=float)
+    scale = np.where(upper > lower, upper - lower, 1.0)
+    x0 = np.clip(np.asarray(params, dtype=float), lower, upper)
+
+    intervals = [(start, end) for (start, _), (end, _) in _occlusion_intervals(x0, *arguments)]
+    initial_coverage = float(sum(end - start for start, end in intervals))
+    if not intervals:
+        info = {'initial_coverage': initial_coverage, 'evaluations': 0, 'iterations': 0,
+                'success': False, 'message': '起点没有遮蔽区间，无法精修'}
+        return x0, initial_coverage, info
+    start_time, end_time = max(intervals, key=lambda interval: interval[1] - interval[0])
+
+    def unpack(z):
+        return lower + z[:4] * scale, z[4] * smoke_lifetime, z[5] * smoke_lifetime
+
+    def margin(p, t):
+        _, positions = _trajectories(p, drone_initial_position, missile_initial_position, sink_speed, missile_speed)
+        missile_positions, smoke_positions = positions(t)
+        return occlusion_margin(missile_positions, smoke_positions, radius, surface_points)[0]
+
+    def constraints(z):
+        p, s, e = unpack(z)
+        explosion_time = p[1] + p[2]
+        return np.array([
+            margin(p, s) / radius,
+            margin(p, e) / radius,
+            (s - explosion_time) / smoke_lifetime,
+            (explosion_time + smoke_lifetime - e) / smoke_lifetime,
+            (e - s) / smoke_lifetime,
+        ])
+
+    z0 = np.concatenate([(x0 - lower) / scale, [start_time / smoke_lifetime, end_time / smoke_lifetime]])
+    objective_gradient = POLISH_OBJECTIVE_SCALE * np.array([0, 0, 0, 0, 1.0, -1.0])
+    result = minimize(lambda z: objective_gradient @ z, z0, jac=lambda z: objective_gradient,
+                      method='SLSQP', bounds=[(0, 1)] * 4 + [(time_window[0] / smoke_lifetime,
+                                                             time_window[1] / smoke_lifetime)] * 2,
+                      constraints=[{'type': 'ineq', 'fun': constraints}],
+                      options={'maxiter': max_iterations, 'ftol': 1e-10})
+
+    # 以完整扫描得到的连续遮蔽时间为准，精修不应使结果变差
+    candidate = np.clip(unpack(result.x)[0], lower, upper)
+    candidate_coverage = smooth_coverage_time(candidate, drone_initial_position, missile_initial_position, **kwargs)
+    success, message = bool(result.success), str(result.message)
+    if candidate_coverage >= initial_coverage:
+        polished_params, polished_coverage = candidate, candidate_coverage
+    else:
+        polished_params, polished_coverage = x0, initial_coverage
+        success = False
+        message = f"精修结果 {candidate_coverage:.6f} s 不如起点，已退回起点 ({message})"
+    info = {
+        'initial_coverage': initial_coverage,
+        'evaluations': int(result.nfev),
+        'iterations': int(result.nit),
+        'success': success,
+        'message': message,
+    }
+    return polished_params, float(polished_coverage), info
@@ -0,0 +1,228 @@
+import math
+import numpy as np
+from utils.missile_tables import resolve_missile_table
+
+# 每个时刻由哪一步给出遮蔽结论
+STAGE_INACTIVE = 0  # 烟幕未起爆或已消散，不参与判断
+STAGE_DISTANCE = 1  # 导弹位于烟幕球内，由距离判断直接给出遮蔽
+STAGE_CONE = 2      # 由圆锥采样判断给出结论
+
+GRAVITY = 9.81
+BACKENDS = ('auto', 'numba', 'numpy')
+# calculate_effective_coverage_time 等接口的 engine 取值：逐点采样的参考实现或上述后端
+ENGINES = ('reference',) + BACKENDS
+
+
+def generate_surface_sample_bank(num, seed=None):
+    """
+    在圆柱侧面上均匀随机取 num 个点，作为所有时刻共用的采样点库。
+    分布与 judge_cross_by_point_pick.generate_surface_point 相同。
+
+    参数：
+    num: 采样点数
+    seed: 随机种子；为 None 时使用全局 np.random 状态，使 np.random.seed 对非 reference 引擎同样生效
+
+    返回：
+    sample_bank: (num, 3)
+    """
+    rng = np.random if seed is None else np.random.default_rng(seed)
+    theta = rng.uniform(0, 2 * math.pi, num)
+    h = rng.uniform(0, 10, num)
+    return np.stack([7 * np.cos(theta), 200 + 7 * np.sin(theta), h], axis=1)
+
+
+def _explosion_state(drone_initial_position, flight_direction, flight_speed, drop_time, explosion_delay):
+    """返回单位飞行方向、引爆点和引爆时刻，与 utils.motion 的运动模型一致"""
+    flight_direction = np.asarray(flight_direction, dtype=float)
+    flight_direction = flight_direction / np.linalg.norm(flight_direction)
+    drop_position = np.asarray(drone_initial_position, dtype=float) + flight_direction * flight_speed * drop_time
+    explosion_position = drop_position + flight_direction * flight_speed * explosion_delay
+    explosion_position[2] = drop_position[2] - 0.5 * GRAVITY * (explosion_delay ** 2)
+    return explosion_position, drop_time + explosion_delay
+
+
+def coverage_mask_numpy(time_range, missile_positions, explosion_position, explosion_time,
+                        radius, smoke_lifetime, sink_speed, sample_bank, chunk_size=1024):
+    """
+    NumPy 向量化的遮蔽判断，判断规则与 cascade_judge 相同（judge_theta 且 judge_inner）。
+
+    missile_positions: 各时刻的导弹位置 (T, 3)，取自 MissileTable.positions
+
+    返回：
+    occluded: (T,) bool
+    stage: (T,) int8
+    """
+    time_range = np.asarray(time_range, dtype=float)
+    occluded = np.zeros(len(time_range), dtype=bool)
+    stage = np.full(len(time_range), STAGE_INACTIVE, dtype=np.int8)
+
+    time_since_explosion = time_range - explosion_time
+    active = np.nonzero((time_since_explosion >= 0) & (time_since_explosion <= smoke_lifetime))[0]
+
+    for begin in range(0, len(active), chunk_size):
+        index = active[begin:begin + chunk_size]
+        chunk_missile_positions = missile_positions[index]
+        smoke_positions = np.repeat(explosion_position[None, :], len(index), axis=0)
+        smoke_positions[:, 2] -= sink_speed * time_since_explosion[index]
+
+        alpha = chunk_missile_positions - smoke_positions
+        d = np.sqrt(np.sum(alpha * alpha, axis=1))
+        inside = d < radius
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            beta = chunk_missile_positions[:, None, :] - sample_bank[None, :, :]
+            dot_product = np.sum(alpha[:, None, :] * beta, axis=2)
+            beta_mag = np.sqrt(np.sum(beta * beta, axis=2))
+            temp_d = np.sqrt(d * d - radius * radius)
+            cos_theta = np.where(d == 0, 0.0, temp_d / d)
+            cos_theta2 = dot_product / (d[:, None] * beta_mag)
+            theta_ok = (dot_product >= 0) & (cos_theta2 > cos_theta[:, None])
+
+            to_center = sample_bank[None, :, :] - smoke_positions[:, None, :]
+            dist2 = np.sqrt(np.sum(to_center * to_center, axis=2))
+            inner_ok = ~((beta_mag < temp_d[:, None]) & (dist2 > radius))
+
+        cone_occluded = np.all(theta_ok & inner_ok, axis=1)
+        occluded[index] = inside | cone_occluded
+        stage[index] = np.where(inside, STAGE_DISTANCE, STAGE_CONE)
+    return occluded, stage
+
+
+def _coverage_mask_loops(time_range, missile_positions, explosion_position, explosion_time,
+                         radius, smoke_lifetime, sink_speed, sample_bank, occluded, stage):
+    """逐时刻、逐采样点的标量循环，由 numba 编译；遇到未遮蔽的点立即停止该时刻的判断"""
+    for i in range(time_range.shape[0]):
+        t = time_range[i]
+        time_since_explosion = t - explosion_time
+        if time_since_explosion < 0 or time_since_explosion > smoke_lifetime:
+            continue
+
+        mx = missile_positions[i, 0]
+        my = missile_positions[i, 1]
+        mz = missile_positions[i, 2]
+        sx = explosion_position[0]
+        sy = explosion_position[1]
+        sz = explosion_position[2] - sink_speed * time_since_explosion
+
+        ax = mx - sx
+        ay = my - sy
+        az = mz - sz
+        d = math.sqrt(ax * ax + ay * ay + az * az)
+        if d < radius:
+            occluded[i] = True
+            stage[i] = 1
+            continue
+
+        stage[i] = 2
+        temp_d = math.sqrt(d * d - radius * radius)
+        cos_theta = 0.0 if d == 0 else temp_d / d
+        all_hidden = True
+        for k in range(sample_bank.shape[0]):
+            bx = mx - sample_bank[k, 0]
+            by = my - sample_bank[k, 1]
+            bz = mz - sample_bank[k, 2]
+            dot_product = ax * bx + ay * by + az * bz
+            if dot_product < 0:
+                all_hidden = False
+                break
+            beta_mag = math.sqrt(bx * bx + by * by + bz * bz)
+            if dot_product / (d * beta_mag) <= cos_theta:
+                all_hidden = False
+                break
+            cx = sample_bank[k, 0] - sx
+            cy = sample_bank[k, 1] - sy
+            cz = sample_bank[k, 2] - sz
+            dist2 = math.sqrt(cx * cx + cy * cy + cz * cz)
+            if beta_mag < temp_d and dist2 > radius:
+                all_hidden = False
+                break
+        occluded[i] = all_hidden
+
+
+_numba_kernel = None
+
+
+def numba_available():
+    """是否安装了 numba"""
+    try:
+        import numba  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _get_numba_kernel():
+    """首次使用时才导入 numba 并编译，cache=True 将编译结果写入 __pycache__，后续进程直接加载"""
+    global _numba_kernel
+    if _numba_kernel is None:
+        import numba
+        _numba_kernel = numba.njit(cache=True)(_coverage_mask_loops)
+    return _numba_kernel
+
+
+def coverage_mask_numba(time_range, missile_positions, explosion_position, explosion_time,
+                        radius, smoke_lifetime, sink_speed, sample_bank):
+    """numba 编译的遮蔽判断，参数与返回值同 coverage_mask_numpy"""
+    time_range = np.ascontiguousarray(time_range, dtype=np.float64)
+    occluded = np.zeros(len(time_range), dtype=np.bool_)
+    stage = np.zeros(len(time_range), dtype=np.int8)
+    _get_numba_kernel()(
+        time_range, np.ascontiguousarray(missile_positions, dtype=np.float64),
+        np.asarray(explosion_position, dtype=np.float64), float(explosion_time),
+        float(radius), float(smoke_lifetime), float(sink_speed),
+        np.ascontiguousarray(sample_bank, dtype=np.float64), occluded, stage)
+    return occluded, stage
+
+
+def select_backend(backend='auto'):
+    """
+    选择计算后端：'auto' 在安装了 numba 时使用 numba，否则退回 numpy；
+    显式指定 'numba' 但未安装时抛出 ImportError。
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"未知的计算后端: {backend}，可选: {', '.join(BACKENDS)}")
+    if backend == 'auto':
+        return 'numba' if numba_available() else 'numpy'
+    if backend == 'numba' and not numba_available():
+        raise ImportError("未安装 numba，请使用 backend='numpy' 或 'auto'")
+    return backend
+
+
+def check_engine(engine, adaptive=False):
+    """
+    检查遮蔽判断引擎的取值，不合法时抛出 ValueError：
+    engine 必须是 ENGINES 之一，自适应采样只有 'reference' 引擎支持。
+    是否安装 numba 由 select_backend 在实际计算时检查。
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"未知的计算引擎: {engine}，可选: {', '.join(ENGINES)}")
+    if adaptive and engine != 'reference':
+        raise ValueError("自适应采样仅支持 engine='reference'")
+
+
+def coverage_mask(time_range, drone_initial_position, missile_initial_position,
+                  flight_speed, drop_time, explosion_delay, flight_direction, sample_bank,
+                  radius=10, smoke_lifetime=20, sink_speed=3, missile_speed=300, backend='auto',
+                  missile_table=None):
+    """
+    计算整个时间序列上的遮蔽掩码。
+
+    参数：
+    sample_bank: 圆柱侧面采样点 (K, 3)，所有时刻共用，见 generate_surface_sample_bank
+    backend: 'auto' / 'numba' / 'numpy'
+    missile_table: 导弹预计算表，为 None 时从 utils.missile_tables 的缓存中获取；
+                   与导弹初始位置、速度或 time_range 不一致时抛出 ValueError
+    其余参数与 calculate_effective_coverage_time 相同
+
+    返回：
+    occluded: (T,) bool
+    stage: (T,) int8，取值为 STAGE_INACTIVE / STAGE_DISTANCE / STAGE_CONE
+    """
+    explosion_position, explosion_time = _explosion_state(
+        drone_initial_position, flight_direction, flight_speed, drop_time, explosion_delay)
+    missile_table = resolve_missile_table(missile_table, missile_initial_position, missile_speed, time_range)
+    sample_bank = np.asarray(sample_bank, dtype=float)
+
+    kernel = coverage_mask_numba if select_backend(backend) == 'numba' else coverage_mask_numpy
+    return kernel(time_range, missile_table.positions, explosion_position, explosion_time,
+                  radius, smoke_lifetime, sink_speed, sample_bank)
@@ -1,5 +1,7 @@
 import math
 import random
+import functools
+import numpy as np
 from utils.judge_cross1 import final_cross_judge
 r = 10
 
@@ -51,14 +53,14 @@ def calculate_distance(point1, point2):
     d = math.sqrt((x1 - x2)**2 + (y1 - y2)**2 + (z1 - z2)**2)
     return d
 
-def judge_inner(missile_point, ball_center, point):
+def judge_inner(missile_point, ball_center, point, radius=r):
     """如果函数返回False，说明圆柱在内部"""
     dist1 = calculate_distance(point1=point, point2=missile_point)
     dist2 = calculate_distance(point1=point, point2=ball_center)
     d = calculate_distance(point1=missile_point, point2=ball_center)
 
-    temp_d = math.sqrt(d * d - r * r)
-    if dist1 < temp_d and dist2 > r:
+    temp_d = math.sqrt(d * d - radius * radius)
+    if dist1 < temp_d and dist2 > radius:
         return False
     return True
 
@@ -69,7 +71,7 @@ def calculate_cos_theta(r, d):
     cos_theta = math.sqrt(d * d - r * r) / d
     return cos_theta
 
-def judge_theta(missile_point, ball_center, point):
+def judge_theta(missile_point, ball_center, point, radius=r):
     """如果函数返回True，说明该点处角度小于切线角度"""
     alpha = calculate_alpha(missile_point, ball_center)
     beta = calculate_beta(missile_point, point)
@@ -84,18 +86,18 @@ def judge_theta(missile_point, ball_center, point):
     cos_theta2 = dot_product / (alpha_mag * beta_mag)
 
     d = calculate_distance(ball_center, missile_point)
-    cos_theta = calculate_cos_theta(r, d)
+    cos_theta = calculate_cos_theta(radius, d)
     if cos_theta2 <= cos_theta:
         return False
     return True
 
-def cascade_judge(missile_point, ball_center, point):
-    if judge_theta(missile_point, ball_center, point):
-        if judge_inner(missile_point, ball_center, point):
+def cascade_judge(missile_point, ball_center, point, radius=r):
+    if judge_theta(missile_point, ball_center, point, radius=radius):
+        if judge_inner(missile_point, ball_center, point, radius=radius):
             return True
     return False
 
-def generate_initial_guess_and_judge(missile_point, ball_center, num=1):
+def generate_initial_guess_and_judge(missile_point, ball_center, num=1, radius=r):
     """生成随机点并对每个点进行判断，所有点都满足条件才返回 True，否则返回 False"""
     points_pick = []
     
@@ -114,16 +116,124 @@ def generate_initial_guess_and_judge(missile_point, ball_center, num=1):
         point = [f, g, h]
         
         # 使用 cascade_judge 对每个点进行判断
-        if not cascade_judge(missile_point, ball_center, point):
+        if not cascade_judge(missile_point, ball_center, point, radius=radius):
             return False  # 如果有任何一个点不满足条件，立即返回 False
         
         points_pick.append(point)
 
     return True
 
-def complete_judge(missile_point, ball_center,num=100):
+def generate_surface_point():
+    """在圆柱侧面上均匀随机取一个点"""
+    theta = random.uniform(0, 2 * math.pi)
+    f = 7 * math.cos(theta)
+    g = 200 + 7 * math.sin(theta)
+    h = random.uniform(0, 10)
+    return [f, g, h]
+
+def _check_adaptive_arguments(tolerance, confidence):
+    """tolerance 应在 [0, 1) 内，confidence 应在 (0, 1) 内，否则抛出 ValueError"""
+    if not 0 <= tolerance < 1:
+        raise ValueError(f"tolerance 应在 [0, 1) 内，实际为 {tolerance}")
+    if not 0 < confidence < 1:
+        raise ValueError(f"confidence 应在 (0, 1) 内，实际为 {confidence}")
+
+def minimum_samples_to_cover(tolerance, confidence):
+    """零个未遮蔽点时，以 confidence 的置信度断言未遮蔽面积占比 p < tolerance 所需的最少采样点数"""
+    _check_adaptive_arguments(tolerance, confidence)
+    if tolerance <= 0:
+        return math.inf
+    return math.ceil(math.log(1 - confidence) / math.log(1 - tolerance))
+
+def _binom_cdf(k, n, p):
+    """二项分布 P(X <= k)，k 通常很小，直接求和比 scipy 的单点调用快"""
+    if k < 0:
+        return 0.0
+    if k >= n:
+        return 1.0
+    return min(1.0, sum(math.comb(n, i) * p ** i * (1 - p) ** (n - i) for i in range(k + 1)))
+
+@functools.lru_cache(maxsize=32)
+def _adaptive_thresholds(max_num, tolerance, confidence):
+    """
+    预先计算采样 n 个点 (n = 1..max_num) 时的判定门限：
+    未遮蔽点数不超过 cover_limit[n-1] 时判定遮蔽，不少于 uncover_limit[n-1] 时判定未遮蔽。
+    scipy.stats 只在自适应采样中用到，在此按需导入，固定采样模式不加载它。
+    """
+    from scipy.stats import binom
+
+    n = np.arange(1, max_num + 1)
+    if tolerance <= 0:
+        # 不允许未遮蔽：只要出现未遮蔽点即可判定，遮蔽无法提前断言
+        return [-1] * max_num, [1] * max_num
+    # 判定遮蔽：binom.cdf(k, n, tolerance) <= 1 - confidence 的最大 k
+    cover_limit = binom.ppf(1 - confidence, n, tolerance).astype(int)
+    cover_limit -= binom.cdf(cover_limit, n, tolerance) > 1 - confidence
+    # 判定未遮蔽：binom.cdf(k - 1, n, tolerance) >= confidence 的最小 k
+    uncover_limit = binom.ppf(confidence, n, tolerance).astype(int) + 1
+    return cover_limit.tolist(), uncover_limit.tolist()
+
+def adaptive_judge(missile_point, ball_center, max_num=200, radius=r,
+                   tolerance=0.02, confidence=0.95):
+    """
+    逐点采样的遮蔽判断，在达到给定置信度时提前停止。
+
+    设 p 为圆柱侧面上未被遮蔽的面积占比，每采样一个点后
+    用单侧精确二项检验比较 p 与 tolerance（门限预先计算，见 _adaptive_thresholds）：
+    - 未遮蔽点足够少，能以 confidence 的置信度断言 p < tolerance 时，返回 True；
+    - 未遮蔽点足够多，能以 confidence 的置信度断言 p > tolerance 时，返回 False。
+    tolerance <= 1 - confidence 时第一个未遮蔽点即可判定未遮蔽，与固定采样一样提前停止；
+    全部遮蔽时需要 minimum_samples_to_cover(tolerance, confidence) 个点，默认参数下为 149 个。
+    处于边界的时刻会继续采样直到 max_num。
+    tolerance=0 时退化为原来的严格判断：出现任意一个未遮蔽点即以置信度 1 返回 False。
+
+    参数：
+    max_num: 采样点数上限
+    tolerance: 允许的未遮蔽面积占比
+    confidence: 目标置信度
+
+    返回：
+    (verdict, achieved_confidence, sample_count)
+    """
+    if max_num < 1:
+        raise ValueError(f"max_num 至少为 1，实际为 {max_num}")
+    _check_adaptive_arguments(tolerance, confidence)
+    cover_limit, uncover_limit = _adaptive_thresholds(max_num, tolerance, confidence)
+    sample_count = 0
+    uncovered_count = 0
+    while sample_count < max_num:
+        point = generate_surface_point()
+        if not cascade_judge(missile_point, ball_center, point, radius=radius):
+            uncovered_count += 1
+        sample_count += 1
+
+        # 在 p = tolerance 的假设下观测到不多于/不少于 uncovered_count 个未遮蔽点的概率
+        if uncovered_count >= uncover_limit[sample_count - 1]:
+            return False, _binom_cdf(uncovered_count - 1, sample_count, tolerance), sample_count
+        if uncovered_count <= cover_limit[sample_count - 1]:
+            return True, 1 - _binom_cdf(uncovered_count, sample_count, tolerance), sample_count
+
+    # 采样预算用完仍未达到目标置信度，按点估计给出结论
+    if uncovered_count <= tolerance * sample_count:
+        return True, 1 - _binom_cdf(uncovered_count, sample_count, tolerance), sample_count
+    return False, _binom_cdf(uncovered_count - 1, sample_count, tolerance), sample_count
+
+def complete_judge(missile_point, ball_center,num=100, radius=r,
+                   adaptive=False, tolerance=0.02, confidence=0.95):
+    """
+    判断导弹视线是否被烟幕完全遮蔽。
+
+    adaptive=False 时固定采样 num 个点，返回 bool；
+    adaptive=True 时调用 adaptive_judge，num 作为采样上限，返回 (bool, 置信度)。
+    """
+    if adaptive:
+        verdict, achieved_confidence, _ = adaptive_judge(
+            missile_point, ball_center, max_num=num, radius=radius,
+            tolerance=tolerance, confidence=confidence)
+        return verdict, achieved_confidence
+
     # if final_cross_judge(missile_position=missile_point,ball_center=ball_center):
-    if generate_initial_guess_and_judge(missile_point=missile_point,ball_center=ball_center,num=num):
+    if generate_initial_guess_and_judge(missile_point=missile_point,ball_center=ball_center,num=num,radius=radius):
         return True
         
     return False
\ No newline at end of file
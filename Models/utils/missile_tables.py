@@ -0,0 +1,92 @@
+import numpy as np
+from collections import OrderedDict
+
+# 假目标位置固定为原点，与 utils.motion.calculate_missile_position 一致
+FAKE_TARGET_POSITION = np.array([0.0, 0.0, 0.0])
+
+# 每个进程缓存的导弹预计算表：(导弹初始位置, 导弹速度) -> MissileTable
+_TABLE_CACHE = OrderedDict()
+TABLE_CACHE_SIZE = 8
+
+
+def missile_unit_direction(missile_initial_position):
+    """导弹飞向假目标（原点）的单位方向及初始距离"""
+    direction = FAKE_TARGET_POSITION - np.asarray(missile_initial_position, dtype=float)
+    direction_norm = np.linalg.norm(direction)
+    return direction / direction_norm, direction_norm
+
+
+class MissileTable:
+    """
+    导弹一侧在整个时间序列上的预计算表，只依赖导弹初始位置、速度和时间序列，
+    同一场景下所有适应度评估共用。
+
+    属性：
+    key: (导弹初始位置, 导弹速度)
+    time_range: 建表所用的时间序列 (T,)
+    unit_direction: 导弹飞行的单位方向 (3,)
+    direction_norm: 导弹初始位置到假目标的距离 (m)
+    positions: 各时刻的导弹位置 (T, 3)
+    """
+
+    def __init__(self, missile_initial_position, missile_speed, time_range):
+        self.missile_initial_position = np.asarray(missile_initial_position, dtype=float)
+        self.missile_speed = float(missile_speed)
+        self.key = table_key(missile_initial_position, missile_speed)
+        self.time_range = time_range
+        self.unit_direction, self.direction_norm = missile_unit_direction(self.missile_initial_position)
+        t = np.asarray(time_range, dtype=float)
+        self.positions = self.missile_initial_position + self.unit_direction * self.missile_speed * t[:, None]
+        self.positions.flags.writeable = False
+
+    def matches(self, time_range):
+        """表是否按 time_range 建立：同一对象直接命中，否则逐元素比较"""
+        if time_range is self.time_range:
+            return True
+        return np.shape(time_range) == np.shape(self.time_range) and np.array_equal(time_range, self.time_range)
+
+
+def table_key(missile_initial_position, missile_speed):
+    return tuple(float(value) for value in missile_initial_position), float(missile_speed)
+
+
+def get_missile_table(missile_initial_position, missile_speed, time_range):
+    """
+    返回导弹预计算表，按导弹初始位置和速度缓存；时间序列改变时重新建表。
+
+    参数：
+    missile_initial_position: 导弹的初始位置 (np.array)
+    missile_speed: 导弹飞行速度 (m/s)
+    time_range: 时间序列 (np.array)，可为共享内存视图
+
+    返回：
+    table: MissileTable
+    """
+    key = table_key(missile_initial_position, missile_speed)
+    table = _TABLE_CACHE.get(key)
+    if table is None or not table.matches(time_range):
+        table = MissileTable(missile_initial_position, missile_speed, time_range)
+        _TABLE_CACHE[key] = table
+        while len(_TABLE_CACHE) > TABLE_CACHE_SIZE:
+            _TABLE_CACHE.popitem(last=False)
+    _TABLE_CACHE.move_to_end(key)
+    return table
+
+
+def resolve_missile_table(missile_table, missile_initial_position, missile_speed, time_range):
+    """
+    检查显式传入的导弹预计算表是否与导弹初始位置、速度和时间序列一致，不一致时抛出 ValueError；
+    missile_table 为 None 时从缓存中获取，见 get_missile_table。
+    """
+    if missile_table is None:
+        return get_missile_table(missile_initial_position, missile_speed, time_range)
+    if missile_table.key != table_key(missile_initial_position, missile_speed):
+        raise ValueError(f"导弹预计算表按 {missile_table.key} 建立，与当前导弹初始位置和速度不一致")
+    if not missile_table.matches(time_range):
+        raise ValueError("导弹预计算表所用的时间序列与 time_range 不一致")
+    return missile_table
+
+
+def clear_missile_tables():
+    """清空本进程的导弹预计算表缓存"""
+    _TABLE_CACHE.clear()
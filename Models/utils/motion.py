@@ -1,6 +1,7 @@
 import numpy as np
 
-def calculate_drop_and_explosion_position(drone_initial_position, flight_direction, flight_speed, drop_time, explosion_delay, t):
+def calculate_drop_and_explosion_position(drone_initial_position, flight_direction, flight_speed, drop_time, explosion_delay, t,
+                                          smoke_lifetime=20, sink_speed=3):
     """
     计算烟幕干扰弹的投放点和引爆点位置，以及当前时间下烟幕干扰弹的位置。
 
@@ -11,6 +12,8 @@ def calculate_drop_and_explosion_position(drone_initial_position, flight_directi
     drop_time (float): 投放时间，单位为秒。
     explosion_delay (float): 引爆延迟时间，单位为秒。
     current_time (float): 当前时间，单位为秒。
+    smoke_lifetime (float): 烟幕有效持续时间，单位为秒，默认20。
+    sink_speed (float): 烟幕引爆后的匀速下沉速度，单位为 m/s，默认3。
 
     返回:
     tuple: 投放点位置、引爆点位置和当前时间下烟幕干扰弹的位置
@@ -44,25 +47,26 @@ def calculate_drop_and_explosion_position(drone_initial_position, flight_directi
         print(f"在 t = {t} 时，错误：烟幕干扰弹未引爆")
         current_vertical_position = None  # 按照自由落体计算
     # 错误检查：烟幕干扰弹已消失
-    elif time_since_explosion > 20:
+    elif time_since_explosion > smoke_lifetime:
         print(f"在 t = {t} 时，错误：烟幕干扰弹已消失")
         current_vertical_position = None  # 烟幕已消失，不再计算垂直位置
     else:
         # 引爆后：匀速下沉
-        current_vertical_position = explosion_position[2] - 3 * time_since_explosion
+        current_vertical_position = explosion_position[2] - sink_speed * time_since_explosion
     
     # 当前时间下烟幕干扰弹的位置
     current_position = np.array([current_horizontal_position[0], current_horizontal_position[1], current_vertical_position])
     #print(f"Smoke position at t = {t}: {current_position}")
     return drop_position, explosion_position, current_position
 
-def calculate_missile_position(missile_initial_position, t):
+def calculate_missile_position(missile_initial_position, t, missile_speed=300):
     """
     计算导弹在时间t时的位置。
 
     参数:
     missile_initial_position (np.array): 导弹的初始位置（坐标），例如 [x, y, z]。
     t (float): 飞行时间，单位为秒。
+    missile_speed (float): 导弹飞行速度，单位为 m/s，默认300。
 
     返回:
     np.array: 导弹在时间t时的位置（坐标）。
@@ -75,9 +79,6 @@ def calculate_missile_position(missile_initial_position, t):
     direction_norm = np.linalg.norm(direction)  # 方向向量的模（距离）
     unit_direction = direction / direction_norm  # 单位方向向量
     
-    # 固定飞行速度
-    missile_speed = 300  # 飞行速度 300 m/s
-    
     # 计算导弹在时间t时的位置
     missile_position = missile_initial_position + unit_direction * missile_speed * t
     #print(f"missile_position at t = {t}: {missile_position}")
@@ -0,0 +1,97 @@
+import sys
+import numpy as np
+from multiprocessing import shared_memory
+
+# 本进程已映射的共享内存段：name -> (SharedMemory, 只读视图)
+_ATTACHED = {}
+
+
+class SharedArray(np.ndarray):
+    """
+    位于共享内存中的只读数组。
+
+    pickle 时只传递共享内存段的名称、形状和 dtype，工作进程反序列化时直接映射同一段内存，
+    不复制数据；切片和运算结果为普通 np.ndarray，按原方式序列化。
+    """
+
+    def __array_finalize__(self, obj):
+        self._shm_name = None
+
+    def __array_wrap__(self, array, context=None, return_scalar=False):
+        array = np.asarray(array)
+        return array[()] if return_scalar else array
+
+    def __reduce__(self):
+        if self._shm_name is None:
+            return np.asarray(self).__reduce__()
+        return attach_shared_array, (self._shm_name, self.shape, self.dtype.str)
+
+
+def _as_shared_view(shm, shape, dtype):
+    view = np.ndarray(shape, dtype=dtype, buffer=shm.buf).view(SharedArray)
+    view._shm_name = shm.name
+    view.flags.writeable = False
+    return view
+
+
+def attach_shared_array(name, shape, dtype):
+    """
+    映射已发布的共享内存段，返回只读视图；同一进程内重复映射时复用已有视图。
+
+    只应在发布者的子进程（如进程池的工作进程）中调用，它们与发布者共用 resource_tracker，
+    共享内存段由发布者负责释放。
+    """
+    if name not in _ATTACHED:
+        if sys.version_info >= (3, 13):
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            shm = shared_memory.SharedMemory(name=name)
+        _ATTACHED[name] = (shm, _as_shared_view(shm, shape, np.dtype(dtype)))
+    return _ATTACHED[name][1]
+
+
+class SharedArrayBroadcast:
+    """
+    将只读数组（时间序列、采样点库、导弹轨迹等）发布到共享内存，供进程池中的工作进程零拷贝读取。
+
+    用法：
+    with SharedArrayBroadcast() as broadcast:
+        time_range = broadcast.publish(np.linspace(0, 50, 50000))
+        executor.map(functools.partial(f, time_range=time_range), ...)
+    """
+
+    def __init__(self):
+        self._segments = []
+
+    def publish(self, array):
+        """
+        复制 array 到新的共享内存段。
+
+        返回：
+        view: 共享内存上的只读 SharedArray，可直接代替 array 使用或传给工作进程
+        """
+        array = np.ascontiguousarray(array)
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+        view = _as_shared_view(shm, array.shape, array.dtype)
+        self._segments.append(shm)
+        _ATTACHED[shm.name] = (shm, view)
+        return view
+
+    def close(self):
+        """释放全部共享内存段；应在工作进程结束后调用"""
+        for shm in self._segments:
+            _ATTACHED.pop(shm.name, None)
+            shm.unlink()
+            try:
+                shm.close()
+            except BufferError:
+                # 仍有视图引用该段，映射在视图被回收后释放
+                pass
+        self._segments = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()